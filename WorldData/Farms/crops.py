@@ -1,63 +1,54 @@
+import argparse
 import os
-import json
-import random
-import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from bvtools import rng
+from bvtools.codec import load_json_file, save_json_file
+from bvtools.parallel import add_jobs_argument, map_files, report_errors
+from bvtools.remap import Remapper
 
 # Directory containing the JSON files
 directory = '.'
 
-# Helper function to handle invalid escape sequences
-def load_json_robust(file_path):
-    try:
-        with open(file_path, 'r') as file:
-            return json.load(file)
-    except json.JSONDecodeError:
-        # Attempt to fix invalid escapes
-        with open(file_path, 'r') as file:
-            data = file.read()
-            # Replace invalid escapes with their literal characters
-            fixed_data = re.sub(r'\\([^"\\bfnrtu])', r'\\\\\1', data)
-            try:
-                return json.loads(fixed_data)
-            except json.JSONDecodeError:
-                print(f"Could not fix JSON decoding in file: {file_path}")
-                return None
-
-# Recursive function to update TextureRecord if conditions are met
-def update_texture_record(data):
-    global modified
-    if isinstance(data, dict):
-        # Check if TextureArchive is 1037 and TextureRecord > 11
-        if data.get("TextureArchive") == 1037 and data.get("TextureRecord", 0) > 11:
-            data["TextureRecord"] = random.randint(0, 11)
-            modified = True
-        # Recursively check nested dictionaries
-        for key, value in data.items():
-            if isinstance(value, (dict, list)):
-                update_texture_record(value)
-    elif isinstance(data, list):
-        # Recursively check each element in the list
-        for item in data:
-            update_texture_record(item)
-
-# Loop through each file in the directory
-for filename in os.listdir(directory):
-    if filename.endswith('.json'):
-        filepath = os.path.join(directory, filename)
-
-        # Read the JSON content with robustness
-        data = load_json_robust(filepath)
-        if data is None:
-            continue
-
-        modified = False
-
-        # Update TextureRecord throughout the JSON
-        update_texture_record(data)
-
-        # Write changes back to the JSON file if modified
-        if modified:
-            with open(filepath, 'w') as file:
-                json.dump(data, file, indent=4)
-            print(f"Modified: {filename}")
-
+# Crops in TextureArchive 1037 with a TextureRecord above 11 get a random one from 0-11
+CROP_RULES = [
+    {"match": "TextureArchive", "action": "reroll", "keys": [1037],
+     "field": "TextureRecord", "above": 11, "range": [0, 11]},
+]
+remapper = Remapper(CROP_RULES)
+
+# Update TextureRecord where the rule matches, drawing the new records from
+# choices (a random.Random). Returns True if anything was changed.
+def update_texture_record(data, choices):
+    return remapper.apply(data, choices)
+
+def process_file(job):
+    filepath, seed = job
+    # Read the JSON content with robustness
+    data = load_json_file(filepath)
+    if data is None:
+        return False
+
+    # Update TextureRecord throughout the JSON and write changes back if modified
+    # One stream per file, so the result doesn't depend on --jobs
+    if update_texture_record(data, rng.stream(seed, "crops", os.path.basename(filepath))):
+        save_json_file(filepath, data)
+        print(f"Modified: {os.path.basename(filepath)}")
+        return True
+    return False
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-roll crop TextureRecords above 11 in archive 1037.")
+    add_jobs_argument(parser)
+    rng.add_seed_argument(parser)
+    args = parser.parse_args()
+    seed = rng.resolve_seed(args.seed)
+
+    jobs = [(os.path.join(directory, filename), seed)
+            for filename in sorted(os.listdir(directory)) if filename.endswith('.json')]
+    results = map_files(process_file, jobs, args.jobs)
+    report_errors(results)
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,66 @@
-import json
+import argparse
 import os
-import random
-
-def update_positions(data, unique_positions, position_counter):
-    """
-    Recursively update positions for all objects with a Position field.
-    """
-    if isinstance(data, dict):
-        # Check if this dict has the Position we're looking to update
-        if "Position" in data:
-            data["Position"] = unique_positions[position_counter[0]]
-            position_counter[0] += 1  # Update the counter
-        # Recursively update nested dictionaries
-        for key in data:
-            update_positions(data[key], unique_positions, position_counter)
-    elif isinstance(data, list):
-        # Recursively update items in the list
-        for item in data:
-            update_positions(item, unique_positions, position_counter)
-
-def process_json_file(file_path, unique_positions, position_counter):
-    with open(file_path, 'r') as file:
-        data = json.load(file)
-    
-    # Start updating positions
-    update_positions(data, unique_positions, position_counter)
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from bvtools import cache, files, rng
+from bvtools.cache import load_json_file, save_json_file
+from bvtools.parallel import add_jobs_argument, map_files, report_errors
+from bvtools.positions import PositionRegistry, position_holders
+
+def count_positions(file_path):
+    data = load_json_file(file_path)
+    if data is None:
+        return 0
+    return sum(1 for _ in position_holders(data))
+
+def process_json_file(job):
+    file_path, new_positions = job
+    data = load_json_file(file_path)
+    if data is None:
+        return
+
+    # Give every object with a Position field the next value of this file's block
+    for holder, position in zip(position_holders(data), new_positions):
+        holder["Position"] = position
 
     # Save the modified data back to the file
-    with open(file_path, 'w') as file:
-        json.dump(data, file, indent=4)
+    save_json_file(file_path, data)
+
+def process_all_json_files(directory, jobs=1, seed=None):
+    seed = rng.resolve_seed(seed)
+    registry = PositionRegistry()
+    registry.refresh()
+
+    # Sorted, so the same seed hands out the same positions
+    file_paths = [os.path.join(directory, filename)
+                  for filename in sorted(os.listdir(directory)) if filename.endswith(".json")]
 
-def process_all_json_files(directory):
-    # Prepare a list of unique positions to use. Adjust the size as needed.
-    # Ensure you have enough unique values for the number of position fields to update.
-    unique_positions = random.sample(range(5000, 10001), 5000)
-    position_counter = [0]  # Use a list as a mutable counter
+    # Every file gets its own block of unused positions up front, so the
+    # workers never need to agree on who takes which value.
+    counts = map_files(count_positions, file_paths, jobs)
+    update_jobs = []
+    for file_path, count in zip(file_paths, counts):
+        if not count.result:
+            continue
+        new_positions = list(registry.lease(count.result))
+        rng.stream(seed, "positions", os.path.basename(file_path)).shuffle(new_positions)
+        update_jobs.append((file_path, new_positions))
+    # Leased values stay taken even if a worker fails
+    registry.save()
 
-    for filename in os.listdir(directory):
-        if filename.endswith(".json"):
-            process_json_file(os.path.join(directory, filename), unique_positions, position_counter)
+    results = map_files(process_json_file, update_jobs, jobs)
+    report_errors(counts + results)
+    registry.refresh()
+    registry.save()
 
-# Process all JSON files in the current directory
-process_all_json_files('.')
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Give every Position field a unique value.")
+    add_jobs_argument(parser)
+    rng.add_seed_argument(parser)
+    args = parser.parse_args()
 
+    # Process all JSON files in the current directory
+    process_all_json_files('.', args.jobs, args.seed)
+    cache.report()
+    files.report()
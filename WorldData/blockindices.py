@@ -1,5 +1,7 @@
 import os
-import json
+
+from bvtools import files
+from bvtools.blockindex import BlockIndexRegistry, read_index, write_index
 
 # Set up directories
 main_directory = os.getcwd()  # Current directory
@@ -10,42 +12,44 @@ if not os.path.exists(vanilla_subdir):
     print(f"Error: '{vanilla_subdir}' does not exist.")
     exit()
 
-# Initialize the starting Index
-new_index = 2000
+def read_indices(directory, file_names):
+    indices = {}
+    for file_name in file_names:
+        try:
+            indices[file_name] = read_index(os.path.join(directory, file_name))
+        except Exception as e:
+            print(f"Error reading Index of {file_name}: {e}")
+    return indices
 
 # Get a sorted list of all *.RMB.json files in the main directory
 json_files = sorted([f for f in os.listdir(main_directory) if f.endswith('.RMB.json')])
+vanilla_files = set(f for f in os.listdir(vanilla_subdir) if f.endswith('.RMB.json'))
+
+# Skip the blocks that exist in vanillarmbs, but keep clear of their indices
+custom_files = [f for f in json_files if f not in vanilla_files]
+vanilla_indices = set(read_indices(vanilla_subdir, sorted(vanilla_files)).values())
+current_indices = read_indices(main_directory, custom_files)
+
+registry = BlockIndexRegistry()
+assigned = registry.assign(custom_files, current_indices, vanilla_indices)
 
-for file_name in json_files:
-    # Check if the file exists in the vanilla subdirectory
-    vanilla_file_path = os.path.join(vanilla_subdir, file_name)
-    if os.path.exists(vanilla_file_path):
-        continue  # Skip if it exists in vanillarmbs
+for file_name in custom_files:
+    new_index = assigned[file_name]
+    if current_indices.get(file_name) == new_index:
+        continue  # Already numbered
 
     # Process the file
     file_path = os.path.join(main_directory, file_name)
     try:
-        # Read the JSON file
-        with open(file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-
-        # Assign the new Index value
-        if "Index" in data:
-            data["Index"] = new_index
-        else:
+        if write_index(file_path, new_index) is None:
             print(f"Error: 'Index' field not found in {file_name}. Skipping file.")
             continue
 
-        # Write the updated JSON back to the file
-        with open(file_path, 'w', encoding='utf-8') as file:
-            json.dump(data, file, indent=4)
-
         # Print the processed file name and assigned Index
         print(f"Processed: {file_name}, Assigned Index: {new_index}")
 
-        # Increment the Index
-        new_index += 1
-
     except Exception as e:
         print(f"Error processing {file_name}: {e}")
 
+registry.save()
+files.report()
@@ -0,0 +1,6 @@
+"""Shared helpers for the WorldData maintenance scripts.
+
+The scripts in WorldData are run from the directory they live in. Scripts in
+subdirectories (diep/, Farms/, NPCs/) add the WorldData directory to sys.path
+before importing from this package.
+"""
@@ -0,0 +1,478 @@
+"""Benchmarks for the shared WorldData helpers.
+
+Run from the WorldData directory, e.g.:
+
+    python -m bvtools.bench codec
+    python -m bvtools.bench codec --repeat 3 buildings diep
+    python -m bvtools.bench overrides
+    python -m bvtools.bench dimensions
+    python -m bvtools.bench geometry
+    python -m bvtools.bench scan
+    python -m bvtools.bench chimney
+    python -m bvtools.bench interiors
+"""
+import argparse
+import contextlib
+import copy
+import json
+import os
+import re
+import time
+import tracemalloc
+
+from bvtools import chimney, codec, columns, dimensions, heights, interiorstore, scan
+from bvtools.buildings import (
+    HOUSE_MODEL_IDS, TAVERN_MODEL_IDS, block_name, index_building_overrides,
+)
+
+
+def find_json_files(paths):
+    """Expand files and directories into a sorted list of *.json files."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names if name.endswith('.json'))
+        elif path.endswith('.json'):
+            files.append(path)
+    return sorted(files)
+
+
+def time_calls(funcs, items, repeat):
+    """Total seconds each func spends on items, taking the best of repeat runs
+    per item. Calls are interleaved item by item so that heap growth and cache
+    warm-up don't favour whichever func runs first."""
+    totals = [0.0] * len(funcs)
+    for item in items:
+        for i, func in enumerate(funcs):
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func(item)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            totals[i] += best
+    return totals
+
+
+def report(title, results, unit_count, unit):
+    print(title)
+    baseline = results[0][1]
+    for name, seconds in results:
+        speedup = baseline / seconds if seconds else float('inf')
+        print(f"  {name:<28} {seconds * 1000:10.1f} ms  {unit_count / seconds if seconds else 0:10.1f} {unit}/s  x{speedup:.2f}")
+
+
+# Copies of the loaders the scripts used before bvtools.codec, kept here so
+# the benchmark can compare against them.
+
+def legacy_placeholder_loads(text, placeholder="__BACKSLASH__"):
+    return json.loads(text.replace("\\", placeholder))
+
+
+def legacy_placeholder_dumps(data, placeholder="__BACKSLASH__"):
+    return json.dumps(data, indent=4).replace(placeholder, "\\")
+
+
+def legacy_regex_loads(text):
+    return json.loads(re.sub(r'\\(?!["\\/bfnrtu])', r'\\\\', text))
+
+
+def legacy_fallback_loads(text, placeholder="__BACKSLASH__"):
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        text = text.replace("\\", placeholder)
+        return json.loads(re.sub(r',\s*([\]}])', r'\1', text))
+
+
+def bench_codec(args):
+    files = find_json_files(args.paths)
+    if not files:
+        print("No JSON files found.")
+        return
+
+    texts = []
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            texts.append(f.read())
+    total_mb = sum(len(text) for text in texts) / (1024 * 1024)
+    print(f"{len(files)} files, {total_mb:.1f} MB")
+
+    decoders = [
+        ("placeholder (merge-buildings)", legacy_placeholder_loads),
+        ("regex (fix-builds)", legacy_regex_loads),
+        ("load+fallback (migrate-det)", legacy_fallback_loads),
+        ("bvtools.codec.loads", codec.loads),
+    ]
+    totals = time_calls([func for _, func in decoders], texts, args.repeat)
+    report("Decode:", list(zip([name for name, _ in decoders], totals)), total_mb, "MB")
+
+    legacy_docs = [legacy_placeholder_loads(text) for text in texts]
+    docs = [codec.loads(text) for text in texts]
+    encoders = [
+        ("placeholder (merge-buildings)", lambda pair: legacy_placeholder_dumps(pair[0])),
+        ("bvtools.codec.dumps", lambda pair: codec.dumps(pair[1])),
+    ]
+    totals = time_calls([func for _, func in encoders], list(zip(legacy_docs, docs)), args.repeat)
+    report("Encode:", list(zip([name for name, _ in encoders], totals)), total_mb, "MB")
+
+    mismatches = [path for path, text, doc in zip(files, texts, docs)
+                  if codec.dumps(doc, 4) != text and codec.dumps(doc, 2) != text]
+    print(f"Round trip: {len(files) - len(mismatches)} of {len(files)} files reproduced byte-for-byte")
+
+
+def legacy_override_scan(buildings_dir, rmb_file, i):
+    """The per-record check random-taverns.py did before the override index:
+    list the directory and match every name against the glob-as-regex."""
+    pattern = f"{rmb_file.replace('.json', '')}-*-building{i}.json"
+    return [f for f in os.listdir(buildings_dir) if re.fullmatch(pattern, f)]
+
+
+def bench_overrides(args):
+    # Every (block, subrecord) the tavern and DIEP passes check for an override
+    lookups = []
+    for rmb_file in sorted(f for f in os.listdir('.') if f.endswith(".RMB.json")):
+        data = codec.load_json_file(rmb_file)
+        if not data:
+            continue
+        for i, sub in enumerate(data.get("RmbBlock", {}).get("SubRecords", [])):
+            for rec in sub.get("Exterior", {}).get("Block3dObjectRecords", []):
+                mid = int(rec.get("ModelIdNum", rec.get("ModelId", -1)))
+                if mid in TAVERN_MODEL_IDS or mid in HOUSE_MODEL_IDS:
+                    lookups.append((rmb_file, i))
+    files = os.listdir(args.buildings)
+    print(f"{len(lookups)} override checks, {len(files)} files in {args.buildings}/")
+
+    def scan(lookup_list):
+        for rmb_file, i in lookup_list:
+            legacy_override_scan(args.buildings, rmb_file, i)
+
+    def index(lookup_list):
+        overrides = index_building_overrides(args.buildings)
+        for rmb_file, i in lookup_list:
+            (block_name(rmb_file), i) in overrides
+
+    totals = time_calls([scan, index], [lookups], args.repeat)
+    report("Override lookups (index build included):",
+           [("listdir + fullmatch per record", totals[0]), ("index_building_overrides", totals[1])],
+           len(lookups), "checks")
+
+    overrides = index_building_overrides(args.buildings)
+    found_scan = sum(1 for rmb_file, i in lookups if legacy_override_scan(args.buildings, rmb_file, i))
+    found_index = sum(1 for rmb_file, i in lookups if (block_name(rmb_file), i) in overrides)
+    print(f"Checks with an override: {found_scan} by the old scan, {found_index} by the index")
+
+
+def bench_dimensions(args):
+    try:
+        import pandas as pd
+    except ImportError:
+        print("pandas is not installed; nothing to compare against.")
+        return
+
+    # The ModelId of every exterior record, as the chimney pass looks them up
+    model_ids = []
+    for rmb_file in sorted(f for f in os.listdir('.') if f.endswith(".RMB.json")):
+        data = codec.load_json_file(rmb_file)
+        for sub in (data or {}).get("RmbBlock", {}).get("SubRecords", []):
+            for rec in sub.get("Exterior", {}).get("Block3dObjectRecords", []):
+                if rec.get("ModelId"):
+                    model_ids.append(rec["ModelId"])
+    print(f"{len(model_ids)} exterior records")
+
+    frame = pd.read_csv(args.csv).set_index("ModelId")
+    frame.index = frame.index.map(str)
+    table = dimensions.load(args.csv)
+
+    def pandas_lookup(ids):
+        for model_id in ids:
+            if str(model_id) in frame.index:
+                frame.loc[str(model_id), "Y"]
+
+    def table_lookup(ids):
+        for model_id in ids:
+            dims = table.get(dimensions.model_key(model_id))
+            if dims is not None:
+                dims.y
+
+    totals = time_calls([pandas_lookup, table_lookup], [model_ids], args.repeat)
+    report("Height lookups:", [("DataFrame .index / .loc", totals[0]), ("bvtools.dimensions", totals[1])],
+           len(model_ids), "lookups")
+
+
+def bench_geometry(args):
+    if not columns.available():
+        print("NumPy is not installed; the columnar view needs it.")
+        return
+
+    blocks = [codec.load_json_file(f) for f in sorted(os.listdir('.')) if f.endswith(".RMB.json")]
+    blocks = [block for block in blocks if block]
+    record_count = sum(1 for block in blocks for _ in columns.exterior_records(block))
+    print(f"{len(blocks)} blocks, {record_count} exterior records")
+
+    def exterior_columns(docs):
+        return columns.RecordColumns((rec for block in docs for rec in columns.exterior_records(block)),
+                                     fields=("ModelIdNum", "YPos"))
+
+    def timed(func, arg):
+        start = time.perf_counter()
+        func(arg)
+        return time.perf_counter() - start
+
+    for name, per_dict, per_column in (("raise", heights.raise_houses, heights.raise_houses_columns),
+                                       ("lower", heights.lower_houses, heights.lower_houses_columns)):
+        dict_copy, column_copy = copy.deepcopy(blocks), copy.deepcopy(blocks)
+
+        def loop(docs):
+            for block in docs:
+                per_dict(block)
+
+        def columnar(docs):
+            cols = exterior_columns(docs)
+            per_column(cols)
+            cols.write_back()
+
+        loop_seconds = timed(loop, dict_copy)
+        columnar_seconds = timed(columnar, column_copy)
+        edit_seconds = timed(per_column, exterior_columns(copy.deepcopy(blocks)))
+        report(f"{name}_houses over the corpus:",
+               [("per-dict loop", loop_seconds), ("columns, build + write_back", columnar_seconds),
+                ("columns, masked edit only", edit_seconds)],
+               record_count, "records")
+        print(f"  same result: {dict_copy == column_copy}")
+
+
+# Paths the read-only reports pull out of every file.
+SCAN_PATTERNS = (
+    ("interior flat textures",
+     ("RmbSubRecord", "Interior", "BlockFlatObjectRecords", scan.ANY, {"TextureArchive", "TextureRecord"})),
+    ("block interior flat textures",
+     ("RmbBlock", "SubRecords", scan.ANY, "Interior", "BlockFlatObjectRecords", scan.ANY,
+      {"TextureArchive", "TextureRecord"})),
+    ("exterior ModelIds",
+     ("RmbSubRecord", "Exterior", "Block3dObjectRecords", scan.ANY, "ModelId")),
+)
+
+
+def select_decoded(data, pattern, path=()):
+    """What scan.values() yields, taken from a fully decoded document."""
+    if len(path) == len(pattern):
+        yield path, data
+        return
+    items = data.items() if isinstance(data, dict) else enumerate(data) if isinstance(data, list) else ()
+    element = pattern[len(path)]
+    for key, value in items:
+        if element == scan.ANY or key == element or (isinstance(element, set) and key in element):
+            yield from select_decoded(value, pattern, path + (key,))
+
+
+def peak_memory(func, items):
+    """Peak traced allocation, in MB, of func over items one at a time."""
+    peak = 0
+    for item in items:
+        tracemalloc.start()
+        func(item)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def bench_scan(args):
+    files = find_json_files(args.paths)
+    texts = []
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            texts.append(f.read())
+    total_mb = sum(len(text) for text in texts) / (1024 * 1024)
+    print(f"{len(files)} files, {total_mb:.1f} MB")
+
+    for name, pattern in SCAN_PATTERNS:
+        def full(text):
+            return list(select_decoded(codec.loads(text), pattern))
+
+        def streamed(text):
+            return list(scan.values(text, pattern))
+
+        totals = time_calls([full, streamed], texts, args.repeat)
+        report(f"{name}:", [("codec.loads + select", totals[0]), ("scan.values", totals[1])], total_mb, "MB")
+        largest = sorted(texts, key=len)[-5:]
+        print(f"  peak memory on the 5 largest files: {peak_memory(full, largest):.1f} MB decoded, "
+              f"{peak_memory(streamed, largest):.1f} MB scanned")
+        print(f"  same values: {all(full(text) == streamed(text) for text in texts)}")
+
+
+# A copy of the chimney pass before bvtools.chimney.stack_template, kept here
+# so the benchmark can compare against it.
+
+def legacy_add_new_entries(json_data, building_dimensions):
+    def process_subrecord(sub_record):
+        if "Interior" in sub_record and "Exterior" in sub_record:
+            interior_records = sub_record["Interior"]["Block3dObjectRecords"]
+            exterior_records = sub_record["Exterior"]["Block3dObjectRecords"]
+            if not any(r.get("ModelIdNum") in chimney.FIREPLACE_IDS and r.get("YPos", 0) >= -100 for r in interior_records):
+                return
+            max_y_value, max_y_rotation, exterior_y_pos, max_model_id = dimensions.tallest_record(
+                exterior_records, building_dimensions)
+            dims = building_dimensions.get(dimensions.model_key(max_model_id)) if max_model_id is not None else None
+            model_offset = dims.model_offset if dims is not None else 0
+            print(f"ModelId: {max_model_id}, ModelOffset: {model_offset}")
+            print(f"ModelId: {max_model_id}, ExteriorYPos: {exterior_y_pos}")
+            max_y_value = 0 if chimney._isna(max_y_value) else max_y_value
+            exterior_y_pos = 0 if chimney._isna(exterior_y_pos) else exterior_y_pos
+            model_offset = 0 if chimney._isna(model_offset) else model_offset
+
+            for interior_record in interior_records:
+                if interior_record.get("ModelIdNum") in chimney.FIREPLACE_IDS and interior_record.get("YPos", 0) >= -100:
+                    base = interior_record.copy()
+                    base["ModelId"] = "52991"
+                    base["ModelIdNum"] = 52991
+                    base["ObjectType"] = 4
+                    base["YRotation"] = max_y_rotation
+                    if max_y_value != float('-inf'):
+                        if max_y_value <= 220:
+                            base["YPos"] = int(-(max_y_value + 20 - exterior_y_pos + model_offset))
+                        elif max_y_value >= 300:
+                            base["YPos"] = int(-(max_y_value - 80 - exterior_y_pos + model_offset))
+                        else:
+                            base["YPos"] = int(-(max_y_value - exterior_y_pos + model_offset))
+                    else:
+                        base["YPos"] = 0
+                    exterior_records.append(base)
+
+                    top = base.copy()
+                    top["ModelId"] = "45077"
+                    top["ModelIdNum"] = 45077
+                    top["YPos"] += 129
+                    top["XScale"] = 0.9
+                    top["ZScale"] = 0.9
+                    exterior_records.append(top)
+
+                    current_y_pos = top["YPos"]
+                    while current_y_pos <= 0:
+                        piece = top.copy()
+                        piece["ModelId"] = "45076"
+                        piece["ModelIdNum"] = 45076
+                        piece["YPos"] = current_y_pos + 114
+                        exterior_records.append(piece)
+                        current_y_pos += 114
+            sub_record["Exterior"]["Header"]["Num3dObjectRecords"] = len(exterior_records)
+
+    if "RmbBlock" in json_data and "SubRecords" in json_data["RmbBlock"]:
+        for sub_record in json_data["RmbBlock"]["SubRecords"]:
+            process_subrecord(sub_record)
+    elif "RmbSubRecord" in json_data:
+        process_subrecord(json_data["RmbSubRecord"])
+    return json_data
+
+
+def bench_chimney(args):
+    table = dimensions.load(args.csv)
+    blocks = []
+    for directory in args.paths:
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".RMB.json"):
+                data = codec.load_json_file(os.path.join(directory, name))
+                if data:
+                    blocks.append(chimney.remove_entries(data))
+    fireplace_count = sum(1 for block in blocks for sub in block.get("RmbBlock", {}).get("SubRecords", [])
+                          for rec in sub.get("Interior", {}).get("Block3dObjectRecords", [])
+                          if rec.get("ModelIdNum") in chimney.FIREPLACE_IDS and rec.get("YPos", 0) >= -100)
+    print(f"{len(blocks)} blocks in {', '.join(args.paths)}, {fireplace_count} fireplaces")
+
+    def timed(func, docs):
+        # The old pass printed two lines per building; they go nowhere here
+        # but still cost their formatting.
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            for block in docs:
+                func(block, table)
+            return time.perf_counter() - start
+
+    best = [None, None]
+    for _ in range(args.repeat):
+        legacy_copy, template_copy = copy.deepcopy(blocks), copy.deepcopy(blocks)
+        chimney.stack_template.cache_clear()
+        for i, (func, docs) in enumerate(((legacy_add_new_entries, legacy_copy),
+                                          (chimney.add_new_entries, template_copy))):
+            seconds = timed(func, docs)
+            best[i] = seconds if best[i] is None else min(best[i], seconds)
+    report("Chimney stacks over the corpus:",
+           [("per-fireplace copies", best[0]), ("stack_template", best[1])], fireplace_count, "fireplaces")
+    info = chimney.stack_template.cache_info()
+    print(f"  {info.currsize} distinct stacks for {info.hits + info.misses} buildings with a fireplace")
+    print(f"  same result: {legacy_copy == template_copy}")
+
+
+def bench_interiors(args):
+    paths = interiorstore.find_files(args.paths)
+    print(f"{len(paths)} files")
+
+    def full(items):
+        return [codec.load_json_file(path) for path in items]
+
+    def deduped(items):
+        store = interiorstore.InteriorStore()
+        return [interiorstore.deduped(codec.load_json_file(path), store) for path in items], store
+
+    results = []
+    for name, func in (("decoded documents", full), ("documents + interior store", deduped)):
+        start = time.perf_counter()
+        func(paths)
+        results.append((name, time.perf_counter() - start))
+    report("Loading the corpus:", results, len(paths), "files")
+
+    # Measured apart from the timings, which tracemalloc slows down.
+    for name, func in (("decoded documents", full), ("documents + interior store", deduped)):
+        tracemalloc.start()
+        held = func(paths)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del held
+        print(f"  {name:<28} {current / (1024 * 1024):8.1f} MB held, {peak / (1024 * 1024):8.1f} MB peak")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the shared WorldData helpers.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    codec_parser = subparsers.add_parser("codec", help="JSON decode/encode against the old per-script loaders")
+    codec_parser.add_argument("paths", nargs="*", default=["."], help="files or directories to load (default: .)")
+    codec_parser.add_argument("--repeat", type=int, default=1, help="take the best of N runs")
+    codec_parser.set_defaults(func=bench_codec)
+
+    overrides_parser = subparsers.add_parser("overrides", help="building-override checks: directory scans against the index")
+    overrides_parser.add_argument("--buildings", default="buildings", help="override directory (default: buildings)")
+    overrides_parser.add_argument("--repeat", type=int, default=1, help="take the best of N runs")
+    overrides_parser.set_defaults(func=bench_overrides)
+
+    dimensions_parser = subparsers.add_parser("dimensions", help="BuildingDimensions lookups: pandas against the dict table")
+    dimensions_parser.add_argument("--csv", default="BuildingDimensions.csv", help="dimensions table (default: BuildingDimensions.csv)")
+    dimensions_parser.add_argument("--repeat", type=int, default=1, help="take the best of N runs")
+    dimensions_parser.set_defaults(func=bench_dimensions)
+
+    geometry_parser = subparsers.add_parser("geometry", help="exterior height edits: per-dict loops against RecordColumns")
+    geometry_parser.set_defaults(func=bench_geometry)
+
+    scan_parser = subparsers.add_parser("scan", help="read-only field reports: full decodes against bvtools.scan")
+    scan_parser.add_argument("paths", nargs="*", default=["."], help="files or directories to scan (default: .)")
+    scan_parser.add_argument("--repeat", type=int, default=1, help="take the best of N runs")
+    scan_parser.set_defaults(func=bench_scan)
+
+    chimney_parser = subparsers.add_parser("chimney", help="chimney stacks: per-fireplace copies against memoized templates")
+    chimney_parser.add_argument("paths", nargs="*", default=[".", "Farms"],
+                                help="directories of blocks (default: . Farms)")
+    chimney_parser.add_argument("--csv", default="BuildingDimensions.csv", help="dimensions table (default: BuildingDimensions.csv)")
+    chimney_parser.add_argument("--repeat", type=int, default=1, help="take the best of N runs")
+    chimney_parser.set_defaults(func=bench_chimney)
+
+    interiors_parser = subparsers.add_parser("interiors", help="whole-corpus memory: decoded documents against the interior store")
+    interiors_parser.add_argument("paths", nargs="*", default=["."], help="files or directories to load (default: .)")
+    interiors_parser.set_defaults(func=bench_interiors)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Stable block Index numbers for the mod's custom blocks.
+
+Every block the mod adds (a *.RMB.json with no counterpart in vanillarmbs/)
+needs an Index of its own. BlockIndexRegistry remembers which one each block
+got, in .bvcache/blockindices.json, and only ever gives out new numbers to
+blocks it hasn't seen, past every number it has given out before. Adding a
+block therefore changes that one block, and a deleted block's number is not
+reused.
+
+A block the registry doesn't know yet keeps the Index it already has, as
+long as no vanilla or other custom block uses it, so an emptied cache
+rebuilds the same assignments from the files.
+
+Only the top of a block is read to get its Index, which DFU writes right
+after the block's Position.
+"""
+import json
+import os
+import re
+
+from bvtools import cache, files, patcher, scan
+
+# New custom blocks are numbered from here, well past the vanilla blocks.
+FIRST_INDEX = 2000
+HEADER_SIZE = 4096
+INDEX_HEADER = re.compile(r'^\s*\{\s*(?:"Position":\s*-?\d+\s*,\s*)?"Index":\s*(-?\d+)')
+
+REGISTRY_VERSION = 1
+REGISTRY_PATH = os.path.join(cache.CACHE_DIR, "blockindices.json")
+
+
+def read_index(path):
+    """The root Index of the block at path, or None if it has none."""
+    with open(path, "r", encoding="utf-8") as f:
+        m = INDEX_HEADER.match(f.read(HEADER_SIZE))
+        if m:
+            return int(m.group(1))
+        # Not in the usual place: look through the root keys.
+        f.seek(0)
+        for _, value in scan.values(f.read(), ("Index",)):
+            return value if isinstance(value, int) else None
+    return None
+
+
+def write_index(path, index):
+    """Set the root Index of the block at path, leaving the rest of the text
+    as it is. Returns True if the file was written, None if it has no
+    Index."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    found = patcher.find(text, ("Index",))
+    if not found:
+        return None
+    return files.write_text(path, patcher.patch(text, [(found[0], str(index))]))
+
+
+class BlockIndexRegistry:
+    """Block name -> Index, for every custom block ever numbered."""
+
+    def __init__(self, path=REGISTRY_PATH):
+        self.path = path
+        self.indices = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("version") == REGISTRY_VERSION:
+                self.indices = saved["indices"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error: Ignoring unreadable block index registry '{path}'. {e}")
+
+    def assign(self, names, current, reserved):
+        """Return {name: Index} for the blocks in names, in order. current
+        maps each name to the Index its file has now (or None); reserved are
+        the vanilla blocks' indices."""
+        taken = set(reserved) | set(self.indices.values())
+        # Blocks seen before keep their number, whatever their file says.
+        new = [name for name in names if name not in self.indices]
+        for name in new:
+            index = current.get(name)
+            if isinstance(index, int) and index > 0 and index not in taken:
+                self.indices[name] = index
+                taken.add(index)
+        next_index = max([FIRST_INDEX - 1] + [i for i in self.indices.values() if i >= FIRST_INDEX]) + 1
+        for name in new:
+            if name not in self.indices:
+                while next_index in taken:
+                    next_index += 1
+                self.indices[name] = next_index
+                taken.add(next_index)
+        return {name: self.indices[name] for name in names}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": REGISTRY_VERSION, "indices": self.indices}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
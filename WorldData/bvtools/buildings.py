@@ -0,0 +1,311 @@
+import csv
+import io
+import os
+import re
+
+from bvtools import files, rng
+from bvtools.codec import load_json_file
+
+# Tavern ModelIds
+TAVERN_MODEL_IDS = {248, 249, 250, 251, 252, 253, 428, 429, 430, 431, 432}
+
+# List of target ModelIds corresponding to DIEP house models
+HOUSE_MODEL_IDS = {
+    116, 117, 124, 125, 126, 127, 128, 129, 130, 131, 132, 133, 134, 135, 136,
+    137, 138, 139, 140, 141, 142, 143, 144, 145, 146, 147, 148, 149, 150, 151,
+    152, 153, 154, 155, 156, 157, 158, 159, 160, 161, 162, 163, 200, 201, 202,
+    203, 204, 205, 206, 207, 208, 209, 210, 211, 212, 213, 214, 215, 320, 321,
+    324, 326, 327, 328, 329, 330, 332, 334, 335, 336, 337, 338, 339, 340, 421, 535,
+    538, 539, 541, 543, 544, 546, 547, 548, 549, 551, 552, 559, 560, 562, 563,
+    601, 602, 605, 606, 608, 610, 614, 658, 659, 663, 702, 704, 705, 707, 708,
+    709
+}
+
+# buildings/<RMB name>-<block index>-building<subrecord index>.json
+OVERRIDE_FILENAME = re.compile(r"(.*\.RMB)-\d+-building(\d+)\.json")
+
+
+def natural_key(s):
+    return [int(t) if t.isdigit() else t.lower() for t in re.split(r"(\d+)", s)]
+
+
+def load_mod_list(dfmod_filename):
+    data = load_json_file(dfmod_filename)
+    files = set()
+    if data and "Files" in data:
+        for path in data["Files"]:
+            base = re.split(r"[\\/]", path)[-1].lower()
+            if base.endswith(".rmb.json"):
+                files.add(base)
+    return files
+
+
+def list_building_files(buildings_dir="buildings"):
+    return [f for f in os.listdir(buildings_dir) if not f.endswith(".meta")]
+
+
+def index_building_overrides(buildings_dir="buildings"):
+    """Map (RMB name, subrecord index) to the override files for it, e.g.
+    ("RESIAS00.RMB", 3) -> ["buildings/RESIAS00.RMB-42-building3.json"].
+
+    Built once per run, so checking a subrecord for an override is a dict
+    lookup instead of a scan of the buildings directory.
+    """
+    overrides = {}
+    for filename in sorted(list_building_files(buildings_dir), key=natural_key):
+        match = OVERRIDE_FILENAME.fullmatch(filename)
+        if match:
+            key = (match.group(1), int(match.group(2)))
+            overrides.setdefault(key, []).append(os.path.join(buildings_dir, filename))
+    return overrides
+
+
+def overrides_by_block(overrides):
+    """Regroup an override index as {RMB name: [(override file, subrecord index)]},
+    in subrecord order."""
+    blocks = {}
+    for (name, index), paths in sorted(overrides.items()):
+        for path in paths:
+            blocks.setdefault(name, []).append((path, index))
+    return blocks
+
+
+def block_name(rmb_file):
+    """'RESIAS00.RMB.json' -> 'RESIAS00.RMB', the key used by the override index."""
+    rmb_file = os.path.basename(rmb_file)
+    return rmb_file[:-len(".json")] if rmb_file.endswith(".json") else rmb_file
+
+
+def group_templates(directory, pattern, model_ids=None):
+    """Group template files in directory by the ModelId captured by pattern.
+
+    pattern is matched against each filename with re.match; its first group is
+    the ModelId. If model_ids is given, other ModelIds are left out.
+    """
+    templates = {}
+    # Sorted, so a seeded choice picks the same file on every system.
+    for filename in sorted(os.listdir(directory), key=natural_key):
+        if filename.endswith(".meta"):
+            continue
+        match = re.match(pattern, filename)
+        if match:
+            model_id = int(match.group(1))
+            if model_ids is None or model_id in model_ids:
+                templates.setdefault(model_id, []).append(os.path.join(directory, filename))
+    return templates
+
+
+def apply_building(rmb_data, building_data, position, rmb_file="RMB"):
+    """Replace building `position` of an RMB block with a building override.
+
+    Returns True if the block was changed.
+    """
+    # Validate position
+    if "RmbBlock" not in rmb_data or "FldHeader" not in rmb_data["RmbBlock"]:
+        print(f"Error: Invalid RMB JSON structure in '{rmb_file}'.")
+        return False
+
+    building_list = rmb_data["RmbBlock"]["FldHeader"].get("BuildingDataList", [])
+    sub_records = rmb_data["RmbBlock"].get("SubRecords", [])
+
+    if position < 0 or position >= len(building_list) or position >= len(sub_records):
+        print(f"Error: Position {position} is out of range in '{rmb_file}'.")
+        return False
+
+    # Replace in BuildingDataList
+    original_building = building_list[position]
+    building_list[position] = {
+        "FactionId": building_data.get("FactionId", original_building.get("FactionId")),
+        "BuildingType": building_data.get("BuildingType", original_building.get("BuildingType")),
+        "Quality": building_data.get("Quality", original_building.get("Quality")),
+        "NameSeed": building_data.get("NameSeed", original_building.get("NameSeed")),
+    }
+
+    # Only update FactionId if the original value is 0
+    if original_building.get("FactionId") != 0:
+        building_list[position]["FactionId"] = original_building.get("FactionId")
+
+    # Replace in SubRecords
+    original_subrecord = sub_records[position]
+    updated_subrecord = original_subrecord.copy()
+
+    # Replace only the "Exterior" and "Interior" parts
+    rmb_sub_record = building_data.get("RmbSubRecord", {})
+    if "Exterior" in rmb_sub_record:
+        updated_exterior = original_subrecord.get("Exterior", {}).copy()
+        updated_exterior.update(
+            {
+                key: value
+                for key, value in rmb_sub_record.get("Exterior", {}).items()
+                if key not in {"XPos", "ZPos", "YRotation"}
+            }
+        )
+        updated_subrecord["Exterior"] = updated_exterior
+
+    if "Interior" in rmb_sub_record:
+        updated_subrecord["Interior"] = rmb_sub_record["Interior"]
+
+    sub_records[position] = updated_subrecord
+    return True
+
+
+def replace_with_tavern(rmb_data, subrecord_index, tavern_data):
+    """
+    Replaces the specified subrecord in the RMB data with the tavern data, adhering to the constraints:
+    - Only update FactionId if the original value is 0.
+    - Do not overwrite XPos, ZPos, or YRotation in Exterior.
+    """
+    building_list = rmb_data["RmbBlock"]["FldHeader"].get("BuildingDataList", [])
+    sub_records = rmb_data["RmbBlock"].get("SubRecords", [])
+
+    if subrecord_index >= len(building_list) or subrecord_index >= len(sub_records):
+        print(f"Error: Subrecord index {subrecord_index} is out of range.")
+        return False
+
+    # Update BuildingDataList
+    original_building = building_list[subrecord_index]
+    building_list[subrecord_index] = {
+        "FactionId": tavern_data.get("FactionId", original_building.get("FactionId")),
+        "BuildingType": tavern_data.get("BuildingType", original_building.get("BuildingType")),
+        "Quality": tavern_data.get("Quality", original_building.get("Quality")),
+        "NameSeed": tavern_data.get("NameSeed", original_building.get("NameSeed")),
+    }
+
+    # Only update FactionId if the original value is 0
+    if original_building.get("FactionId") != 0:
+        building_list[subrecord_index]["FactionId"] = original_building.get("FactionId")
+
+    # Update SubRecords
+    original_subrecord = sub_records[subrecord_index]
+    updated_subrecord = original_subrecord.copy()
+
+    # Replace Exterior and Interior while preserving XPos, ZPos, and YRotation
+    tavern_exterior = tavern_data.get("RmbSubRecord", {}).get("Exterior", {})
+    tavern_interior = tavern_data.get("RmbSubRecord", {}).get("Interior", {})
+
+    if "Exterior" in original_subrecord:
+        updated_exterior = original_subrecord["Exterior"].copy()
+        updated_exterior.update(
+            {
+                key: value
+                for key, value in tavern_exterior.items()
+                if key not in {"XPos", "ZPos", "YRotation"}
+            }
+        )
+        updated_subrecord["Exterior"] = updated_exterior
+
+    if "Interior" in original_subrecord:
+        updated_subrecord["Interior"] = tavern_interior
+
+    sub_records[subrecord_index] = updated_subrecord
+    return True
+
+
+def replace_with_house(rmb_data, idx, house_data):
+    bdl = rmb_data["RmbBlock"]["FldHeader"].get("BuildingDataList", [])
+    srs = rmb_data["RmbBlock"].get("SubRecords", [])
+    if idx >= len(bdl) or idx >= len(srs):
+        return False
+    orig_b = bdl[idx]
+    bdl[idx] = {
+        "FactionId":    house_data.get("FactionId",   orig_b.get("FactionId")),
+        "BuildingType": house_data.get("BuildingType",orig_b.get("BuildingType")),
+        "Quality":      house_data.get("Quality",     orig_b.get("Quality")),
+        "NameSeed":     house_data.get("NameSeed",    orig_b.get("NameSeed")),
+    }
+    if orig_b.get("FactionId") != 0:
+        bdl[idx]["FactionId"] = orig_b.get("FactionId")
+    orig_sr = srs[idx]
+    upd_sr = orig_sr.copy()
+    if "Interior" in orig_sr and "RmbSubRecord" in house_data:
+        upd_sr["Interior"] = house_data["RmbSubRecord"]["Interior"]
+    srs[idx] = upd_sr
+    return True
+
+
+def assign_taverns(rmb_file, rmb_data, taverns_by_model_id, overrides, load=load_json_file,
+                   seed=rng.DEFAULT_SEED):
+    """Give every tavern in the block a random tavern template, unless a
+    building override exists for it (overrides is an index_building_overrides()
+    result). Templates are read with load(path), and chosen from the
+    rng.stream() of seed, block and subrecord. Returns True if the block was
+    changed."""
+    changed = False
+    name = block_name(rmb_file)
+
+    # Iterate through SubRecords
+    sub_records = rmb_data["RmbBlock"].get("SubRecords", [])
+    for i, sub_record in enumerate(sub_records):
+        exterior = sub_record.get("Exterior", {})
+        block3d_object_records = exterior.get("Block3dObjectRecords", [])
+        choices = rng.stream(seed, "taverns", name, i)
+
+        for record in block3d_object_records:
+            model_id = int(record.get("ModelId", -1))
+            if model_id in TAVERN_MODEL_IDS:
+                # Check for a corresponding building file
+                if (name, i) in overrides:
+                    print(f"Found corresponding building file for subrecord {i}, skipping replacement.")
+                    continue
+
+                # Assign a random tavern
+                if model_id in taverns_by_model_id:
+                    chosen_tavern_file = choices.choice(taverns_by_model_id[model_id])
+                    print(f"Assigning random tavern '{chosen_tavern_file}' to subrecord {i}.")
+
+                    tavern_data = load(chosen_tavern_file)
+                    if tavern_data and replace_with_tavern(rmb_data, i, tavern_data):
+                        changed = True
+
+    return changed
+
+
+def assign_houses(rmb_file, rmb_data, diep_by_model, overrides, mod_rmbs, mappings, load=load_json_file,
+                  seed=rng.DEFAULT_SEED):
+    """Give every DIEP house in the block a random DIEP interior, unless a
+    building override exists for it (overrides is an index_building_overrides()
+    result). Templates are read with load(path), and chosen from the
+    rng.stream() of seed, block and subrecord. Choices for blocks listed in mod_rmbs are appended to mappings as
+    (newFilename, originalDiepFile).
+
+    Returns True if the block was changed.
+    """
+    rmb_index = rmb_data.get("Index")
+    rmb_name = rmb_data.get("Name", "").strip()
+    if rmb_index is None or not rmb_name:
+        print(f"Skipping '{rmb_file}' due to missing header info.")
+        return False
+
+    changed = False
+    name = block_name(rmb_file)
+    subs = rmb_data.get("RmbBlock", {}).get("SubRecords", [])
+    for i, sub in enumerate(subs):
+        ext = sub.get("Exterior", {})
+        recs = ext.get("Block3dObjectRecords", [])
+        for rec in recs:
+            mid = int(rec.get("ModelIdNum", rec.get("ModelId", -1)))
+            if mid in HOUSE_MODEL_IDS and mid in diep_by_model:
+                # skip if existing building file
+                if (name, i) in overrides:
+                    break
+                choice = rng.stream(seed, "dieps", name, i).choice(diep_by_model[mid])
+                house_data = load(choice)
+                if house_data:
+                    if replace_with_house(rmb_data, i, house_data):
+                        changed = True
+                    # record only if this RMB is in the mod lists
+                    if rmb_file.lower() in mod_rmbs:
+                        new_filename = f"{rmb_name}-{rmb_index}-building{i}.json"
+                        mappings.append((new_filename, os.path.basename(choice)))
+                break
+
+    return changed
+
+
+def write_diep_mappings(mappings, path="bcbv_diep_mappings.csv"):
+    cf = io.StringIO(newline="")
+    writer = csv.writer(cf)
+    writer.writerow(["NewFilename", "OriginalDiepFile"])
+    for newfn, orig in sorted(mappings, key=lambda x: natural_key(x[0])):
+        writer.writerow([newfn, orig])
+    files.write_text(path, cf.getvalue(), newline="")
@@ -0,0 +1,193 @@
+"""On-disk cache of decoded JSON documents.
+
+Each source file gets one entry in .bvcache/docs holding the file's size,
+mtime and SHA-1 followed by the pickled document. An entry is used when the
+size and mtime still match, or when they don't but the content hash does
+(e.g. after a checkout touched the file). Anything else re-decodes the source
+and replaces the entry.
+
+The cache lives next to this package in .bvcache, which Unity ignores because
+of the leading dot. Set BVTOOLS_CACHE_DIR to move it, or BVTOOLS_NO_CACHE=1
+to bypass it.
+
+    python -m bvtools.cache clear
+"""
+import argparse
+import gc
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import sys
+
+from bvtools import codec, files
+
+# Bump when the codec or the entry layout changes so old entries are ignored.
+CACHE_VERSION = 1
+
+CACHE_DIR = os.environ.get("BVTOOLS_CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".bvcache")
+DOCS_DIR = os.path.join(CACHE_DIR, "docs")
+
+stats = {"hits": 0, "misses": 0}
+
+
+def enabled():
+    return not os.environ.get("BVTOOLS_NO_CACHE")
+
+
+def entry_path(path):
+    key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+    return os.path.join(DOCS_DIR, key[:2], key + ".pickle")
+
+
+def read_header(entry):
+    """Return (header, open file positioned at the document) or (None, None)."""
+    try:
+        f = open(entry, "rb")
+    except OSError:
+        return None, None
+    try:
+        header = pickle.load(f)
+    except Exception:
+        f.close()
+        return None, None
+    if not isinstance(header, dict) or header.get("version") != CACHE_VERSION:
+        f.close()
+        return None, None
+    return header, f
+
+
+def read_document(f):
+    # Unpickling allocates as many dicts as decoding did; see codec.loads().
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return pickle.load(f)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def write_entry(entry, header, data):
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    tmp = f"{entry}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, entry)
+
+
+def make_header(path, st, digest):
+    return {
+        "version": CACHE_VERSION,
+        "path": os.path.abspath(path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha1": digest,
+    }
+
+
+def load(path):
+    """Decode a JSON file through the cache. Raises like codec.loads()."""
+    if not enabled():
+        with open(path, "rb") as f:
+            return codec.loads(f.read().decode("utf-8"))
+
+    st = os.stat(path)
+    entry = entry_path(path)
+    header, f = read_header(entry)
+    raw = None
+    if header is not None:
+        try:
+            if header["size"] == st.st_size and header["mtime_ns"] == st.st_mtime_ns:
+                stats["hits"] += 1
+                return read_document(f)
+            if header["size"] == st.st_size:
+                with open(path, "rb") as src:
+                    raw = src.read()
+                if hashlib.sha1(raw).hexdigest() == header["sha1"]:
+                    data = read_document(f)
+                    f.close()
+                    f = None
+                    write_entry(entry, make_header(path, st, header["sha1"]), data)
+                    stats["hits"] += 1
+                    return data
+        finally:
+            if f is not None:
+                f.close()
+
+    stats["misses"] += 1
+    if raw is None:
+        with open(path, "rb") as src:
+            raw = src.read()
+    data = codec.loads(raw.decode("utf-8"))
+    try:
+        write_entry(entry, make_header(path, st, hashlib.sha1(raw).hexdigest()), data)
+    except OSError as e:
+        print(f"Warning: could not write cache entry for '{path}'. {e}")
+    return data
+
+
+def store(path, text, data):
+    """Record that path now holds text, which decodes to data."""
+    if not enabled():
+        return
+    raw = text.encode("utf-8")
+    try:
+        write_entry(entry_path(path), make_header(path, os.stat(path), hashlib.sha1(raw).hexdigest()), data)
+    except OSError as e:
+        print(f"Warning: could not write cache entry for '{path}'. {e}")
+
+
+def load_json_file(path):
+    """Cached counterpart of codec.load_json_file()."""
+    try:
+        return load(path)
+    except json.JSONDecodeError as e:
+        print(f"Error: Failed to decode JSON file '{path}'. {e}")
+    except Exception as e:
+        print(f"Error: Unexpected error while reading file '{path}'. {e}")
+    return None
+
+
+def save_json_file(path, data, indent=4):
+    """Save like codec.save_json_file() and refresh the cache entry, so the
+    next script to read path skips the decode."""
+    try:
+        text = codec.dumps(data, indent)
+        written = files.write_text(path, text)
+    except Exception as e:
+        print(f"Error: Failed to save JSON file '{path}'. {e}")
+        return False
+    if written:
+        store(path, text, data)
+    return True
+
+
+def report():
+    total = stats["hits"] + stats["misses"]
+    if total:
+        print(f"Parse cache: {stats['hits']} hits, {stats['misses']} misses")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the decoded JSON cache.")
+    parser.add_argument("command", choices=["clear", "info"])
+    args = parser.parse_args()
+
+    if args.command == "clear":
+        shutil.rmtree(DOCS_DIR, ignore_errors=True)
+        print(f"Cleared {DOCS_DIR}")
+    else:
+        count = size = 0
+        for root, _, names in os.walk(DOCS_DIR):
+            for name in names:
+                count += 1
+                size += os.path.getsize(os.path.join(root, name))
+        print(f"{DOCS_DIR}: {count} entries, {size / (1024 * 1024):.1f} MB")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
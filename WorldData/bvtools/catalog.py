@@ -0,0 +1,416 @@
+"""SQLite catalog of the records in every WorldData JSON file.
+
+One row per 3D model, flat, NPC and building record of every RMB block,
+building override, tavern/DIEP template, object group and location file,
+indexed so that
+questions like "which blocks use ModelId 41116?" or "where is flat 1037/14?"
+are answered without opening any JSON:
+
+    python -m bvtools.catalog update           # (re)index changed files
+    python -m bvtools.catalog model 41116
+    python -m bvtools.catalog texture 1037 14
+    python -m bvtools.catalog building --type 18 --faction 0
+    python -m bvtools.catalog sql "SELECT COUNT(*) FROM models"
+
+update only decodes files whose content changed: a file is skipped when its
+size and mtime match the catalog, or when they don't but its SHA-1 does.
+Rows of deleted files are dropped. The database is .bvcache/catalog.sqlite.
+
+Rows record where they came from: the file, the subrecord (SubRecords index
+in a block, the building index of an override's file name, the Buildings
+index of a location; NULL for block-level Misc records and templates), the
+section ("Exterior", "Interior" or "Misc") and the record's index in its list.
+
+Scripts that only change the records holding certain models or textures ask
+files_matching() which files to open instead of walking the whole tree; it
+brings the catalog up to date first, so edited files are never missed.
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+
+from bvtools import cache, codec
+from bvtools.buildings import OVERRIDE_FILENAME
+from bvtools.parallel import add_jobs_argument, map_files, report_errors
+
+# Bump when the schema or what gets extracted changes; the catalog is then
+# rebuilt from scratch.
+CATALOG_VERSION = 2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CATALOG_PATH = os.path.join(cache.CACHE_DIR, "catalog.sqlite")
+
+SCHEMA = """
+CREATE TABLE files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha1 TEXT NOT NULL
+);
+CREATE TABLE models (
+    file_id INTEGER NOT NULL, subrecord INTEGER, section TEXT NOT NULL, record INTEGER NOT NULL,
+    model_id INTEGER, object_type INTEGER,
+    x INTEGER, y INTEGER, z INTEGER, y_rotation INTEGER
+);
+CREATE TABLE flats (
+    file_id INTEGER NOT NULL, subrecord INTEGER, section TEXT NOT NULL, record INTEGER NOT NULL,
+    texture_archive INTEGER, texture_record INTEGER, faction_id INTEGER, flags INTEGER,
+    position INTEGER, x INTEGER, y INTEGER, z INTEGER
+);
+CREATE TABLE npcs (
+    file_id INTEGER NOT NULL, subrecord INTEGER, section TEXT NOT NULL, record INTEGER NOT NULL,
+    texture_archive INTEGER, texture_record INTEGER, faction_id INTEGER, flags INTEGER,
+    position INTEGER, x INTEGER, y INTEGER, z INTEGER
+);
+CREATE TABLE buildings (
+    file_id INTEGER NOT NULL, subrecord INTEGER,
+    building_type, faction_id INTEGER, name_seed INTEGER, quality INTEGER,
+    location_id INTEGER, sector INTEGER
+);
+CREATE INDEX models_model_id ON models (model_id);
+CREATE INDEX models_file ON models (file_id, subrecord);
+CREATE INDEX flats_texture ON flats (texture_archive, texture_record);
+CREATE INDEX flats_faction_id ON flats (faction_id);
+CREATE INDEX flats_file ON flats (file_id, subrecord);
+CREATE INDEX npcs_texture ON npcs (texture_archive, texture_record);
+CREATE INDEX npcs_faction_id ON npcs (faction_id);
+CREATE INDEX npcs_file ON npcs (file_id, subrecord);
+CREATE INDEX buildings_type ON buildings (building_type);
+CREATE INDEX buildings_faction_id ON buildings (faction_id);
+CREATE INDEX buildings_file ON buildings (file_id, subrecord);
+"""
+
+RECORD_TABLES = ("models", "flats", "npcs", "buildings")
+
+
+def model_id(record):
+    """ModelIdNum, or the ModelId string if that is all a record has."""
+    value = record.get("ModelIdNum")
+    if isinstance(value, int):
+        return value
+    text = str(record.get("ModelId", ""))
+    return int(text) if text.isdigit() else None
+
+
+def model_row(subrecord, section, index, record):
+    return (subrecord, section, index, model_id(record), record.get("ObjectType"),
+            record.get("XPos"), record.get("YPos"), record.get("ZPos"), record.get("YRotation"))
+
+
+def flat_row(subrecord, section, index, record):
+    return (subrecord, section, index, record.get("TextureArchive"), record.get("TextureRecord"),
+            record.get("FactionID"), record.get("Flags"), record.get("Position"),
+            record.get("XPos"), record.get("YPos"), record.get("ZPos"))
+
+
+def building_row(subrecord, building):
+    return (subrecord, building.get("BuildingType"), building.get("FactionId"), building.get("NameSeed"),
+            building.get("Quality"), building.get("LocationId"), building.get("Sector"))
+
+
+def add_sub_record(rows, subrecord, sub_record):
+    for section in ("Exterior", "Interior"):
+        part = sub_record.get(section)
+        if not isinstance(part, dict):
+            continue
+        for i, record in enumerate(part.get("Block3dObjectRecords") or []):
+            rows["models"].append(model_row(subrecord, section, i, record))
+        for i, record in enumerate(part.get("BlockFlatObjectRecords") or []):
+            rows["flats"].append(flat_row(subrecord, section, i, record))
+        for i, record in enumerate(part.get("BlockPeopleRecords") or []):
+            rows["npcs"].append(flat_row(subrecord, section, i, record))
+
+
+def extract(data, filename):
+    """Return (kind, {table: [row, ...]}) for a decoded file."""
+    rows = {table: [] for table in RECORD_TABLES}
+    if not isinstance(data, dict):
+        return "other", rows
+
+    block = data.get("RmbBlock")
+    kind = "block"
+    if not isinstance(block, dict) and "FldHeader" in data and "SubRecords" in data:
+        # Object groups and other prefabs: the inside of an RmbBlock
+        block = data
+        kind = "group"
+    if isinstance(block, dict):
+        for i, sub_record in enumerate(block.get("SubRecords") or []):
+            add_sub_record(rows, i, sub_record)
+        for i, record in enumerate(block.get("Misc3dObjectRecords") or []):
+            rows["models"].append(model_row(None, "Misc", i, record))
+        for i, record in enumerate(block.get("MiscFlatObjectRecords") or []):
+            rows["flats"].append(flat_row(None, "Misc", i, record))
+        header = block.get("FldHeader") or {}
+        for i, building in enumerate(header.get("BuildingDataList") or []):
+            rows["buildings"].append(building_row(i, building))
+        return kind, rows
+
+    sub_record = data.get("RmbSubRecord")
+    if isinstance(sub_record, dict):
+        match = OVERRIDE_FILENAME.fullmatch(filename)
+        subrecord = int(match.group(2)) if match else None
+        add_sub_record(rows, subrecord, sub_record)
+        if "BuildingType" in data:
+            rows["buildings"].append(building_row(subrecord, data))
+        return "building", rows
+
+    exterior = data.get("Exterior")
+    if isinstance(exterior, dict) and isinstance(exterior.get("Buildings"), list):
+        for i, building in enumerate(exterior["Buildings"]):
+            rows["buildings"].append(building_row(i, building))
+        return "location", rows
+
+    return "other", rows
+
+
+def index_file(path):
+    """Decode one file and extract its rows. Runs in the worker processes."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    data = codec.loads(raw.decode("utf-8"))
+    kind, rows = extract(data, os.path.basename(path))
+    return hashlib.sha1(raw).hexdigest(), kind, rows
+
+
+def find_json_files(directory):
+    found = []
+    for root, dirs, names in os.walk(directory):
+        # .bvcache, .bvwork, .git
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        found.extend(os.path.join(root, name) for name in sorted(names) if name.endswith(".json"))
+    return found
+
+
+def connect(path=CATALOG_PATH):
+    """Open the catalog, creating it (or recreating an outdated one)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    if conn.execute("PRAGMA user_version").fetchone()[0] != CATALOG_VERSION:
+        conn.close()
+        os.remove(path)
+        conn = sqlite3.connect(path)
+        conn.executescript(SCHEMA)
+        conn.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+        conn.commit()
+    return conn
+
+
+def key(path):
+    """A file's path in the catalog: relative to ROOT, whichever directory
+    was scanned to find it."""
+    return os.path.relpath(os.path.abspath(path), ROOT).replace(os.sep, "/")
+
+
+def under(rel, prefix):
+    """True if catalog path rel is inside the directory whose key is prefix."""
+    return prefix == "." or rel.startswith(prefix + "/")
+
+
+def delete_rows(conn, file_id):
+    for table in RECORD_TABLES:
+        conn.execute(f"DELETE FROM {table} WHERE file_id = ?", (file_id,))
+
+
+def update(conn, directory=".", jobs=1):
+    """Bring the catalog in line with the JSON under directory, leaving the
+    rows of files elsewhere alone. Returns the number of files (re)indexed."""
+    prefix = key(directory)
+    known = {row[0]: row[1:] for row in conn.execute("SELECT path, id, size, mtime_ns, sha1 FROM files")
+             if under(row[0], prefix)}
+    stale = []
+    unchanged = 0
+    seen = set()
+    for path in find_json_files(directory):
+        rel = key(path)
+        seen.add(rel)
+        st = os.stat(path)
+        entry = known.get(rel)
+        if entry and entry[1:3] == (st.st_size, st.st_mtime_ns):
+            unchanged += 1
+            continue
+        if entry and entry[1] == st.st_size:
+            with open(path, "rb") as f:
+                if hashlib.sha1(f.read()).hexdigest() == entry[3]:
+                    conn.execute("UPDATE files SET mtime_ns = ? WHERE id = ?", (st.st_mtime_ns, entry[0]))
+                    unchanged += 1
+                    continue
+        stale.append((path, rel, st))
+
+    results = map_files(index_file, [path for path, _, _ in stale], jobs)
+    for (path, rel, st), result in zip(stale, results):
+        entry = known.get(rel)
+        if entry:
+            delete_rows(conn, entry[0])
+            conn.execute("DELETE FROM files WHERE id = ?", (entry[0],))
+        if result.error:
+            continue
+        sha1, kind, rows = result.result
+        file_id = conn.execute("INSERT INTO files (path, kind, size, mtime_ns, sha1) VALUES (?, ?, ?, ?, ?)",
+                               (rel, kind, st.st_size, st.st_mtime_ns, sha1)).lastrowid
+        for table, table_rows in rows.items():
+            if table_rows:
+                width = len(table_rows[0]) + 1
+                conn.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * width)})",
+                                 [(file_id,) + row for row in table_rows])
+
+    removed = [entry for rel, entry in known.items() if rel not in seen]
+    for entry in removed:
+        delete_rows(conn, entry[0])
+        conn.execute("DELETE FROM files WHERE id = ?", (entry[0],))
+    conn.commit()
+
+    report_errors(results)
+    print(f"Catalog: {len(stale)} indexed, {unchanged} unchanged, {len(removed)} removed")
+    return len(stale)
+
+
+def files_with_models(conn, model_ids):
+    """{path: set of subrecords} for the files holding any of model_ids."""
+    found = {}
+    ids = list(model_ids)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        for path, subrecord in conn.execute(
+                f"SELECT DISTINCT files.path, models.subrecord FROM models JOIN files ON files.id = models.file_id "
+                f"WHERE models.model_id IN ({', '.join('?' * len(chunk))})", chunk):
+            found.setdefault(path, set()).add(subrecord)
+    return found
+
+
+def files_with_textures(conn, pairs, tables=("flats", "npcs")):
+    """{path: set of subrecords} for the files holding any (archive, record)
+    pair; record None matches every record of the archive."""
+    found = {}
+    for table in tables:
+        for archive, record in pairs:
+            query = (f"SELECT DISTINCT files.path, {table}.subrecord FROM {table} "
+                     f"JOIN files ON files.id = {table}.file_id WHERE {table}.texture_archive = ?")
+            params = (archive,)
+            if record is not None:
+                query += f" AND {table}.texture_record = ?"
+                params += (record,)
+            for path, subrecord in conn.execute(query, params):
+                found.setdefault(path, set()).add(subrecord)
+    return found
+
+
+def files_matching(directory=".", models=(), textures=(), archives=(), recursive=True, jobs=1):
+    """Paths of the JSON files in directory (and its subdirectories, if
+    recursive) holding any of the ModelIdNums models, (archive, record)
+    textures, or any record of archives, in sorted order. Paths are joined
+    onto directory like os.walk() would. The catalog of the whole WorldData
+    tree is updated first."""
+    conn = connect()
+    try:
+        update(conn, ROOT, jobs)
+        found = set(files_with_models(conn, models))
+        found.update(files_with_textures(conn, list(textures) + [(archive, None) for archive in archives]))
+    finally:
+        conn.close()
+
+    directory_abs = os.path.abspath(directory)
+    paths = []
+    for rel in found:
+        path = os.path.join(ROOT, *rel.split("/"))
+        inner = os.path.relpath(path, directory_abs)
+        if inner.startswith(os.pardir) or (not recursive and os.sep in inner):
+            continue
+        paths.append(os.path.join(directory, inner))
+    return sorted(paths)
+
+
+def print_rows(cursor):
+    columns = [d[0] for d in cursor.description]
+    rows = cursor.fetchall()
+    print("\t".join(columns))
+    for row in rows:
+        print("\t".join("" if value is None else str(value) for value in row))
+    print(f"({len(rows)} rows)")
+
+
+def cmd_update(conn, args):
+    update(conn, args.directory, args.jobs)
+
+
+def cmd_model(conn, args):
+    print_rows(conn.execute(
+        "SELECT files.path, subrecord, section, record, model_id, x, y, z, y_rotation FROM models "
+        "JOIN files ON files.id = models.file_id WHERE model_id = ? ORDER BY files.path, subrecord, section, record",
+        (args.model_id,)))
+
+
+def cmd_texture(conn, args):
+    where = "texture_archive = ?" + (" AND texture_record = ?" if args.record is not None else "")
+    params = (args.archive,) + ((args.record,) if args.record is not None else ())
+    print_rows(conn.execute(
+        f"SELECT files.path, hits.kind, subrecord, section, record, texture_archive, texture_record, faction_id FROM "
+        f"(SELECT 'flat' AS kind, * FROM flats WHERE {where} UNION ALL "
+        f"SELECT 'npc' AS kind, * FROM npcs WHERE {where}) AS hits "
+        f"JOIN files ON files.id = hits.file_id ORDER BY files.path, subrecord, section, record",
+        params * 2))
+
+
+def cmd_building(conn, args):
+    conditions, params = [], []
+    for column, value in (("building_type", args.type), ("faction_id", args.faction)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(int(value) if value.lstrip("-").isdigit() else value)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    print_rows(conn.execute(
+        f"SELECT files.path, subrecord, building_type, faction_id, name_seed, quality, location_id, sector "
+        f"FROM buildings JOIN files ON files.id = buildings.file_id {where} ORDER BY files.path, subrecord",
+        params))
+
+
+def cmd_sql(conn, args):
+    print_rows(conn.execute(args.query))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index and query the records in the WorldData JSON.")
+    parser.add_argument("--db", default=CATALOG_PATH, help=f"catalog database (default: {CATALOG_PATH})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    update_parser = subparsers.add_parser("update", help="index new and changed JSON files")
+    update_parser.add_argument("directory", nargs="?", default=".", help="WorldData directory (default: .)")
+    add_jobs_argument(update_parser)
+    update_parser.set_defaults(func=cmd_update)
+
+    model_parser = subparsers.add_parser("model", help="where a ModelId is placed")
+    model_parser.add_argument("model_id", type=int)
+    model_parser.set_defaults(func=cmd_model)
+
+    texture_parser = subparsers.add_parser("texture", help="where a flat or NPC texture is placed")
+    texture_parser.add_argument("archive", type=int)
+    texture_parser.add_argument("record", type=int, nargs="?")
+    texture_parser.set_defaults(func=cmd_texture)
+
+    building_parser = subparsers.add_parser("building", help="building records by type and faction")
+    building_parser.add_argument("--type", help="BuildingType (a number, or a name like Tavern in locations)")
+    building_parser.add_argument("--faction", help="FactionId")
+    building_parser.set_defaults(func=cmd_building)
+
+    sql_parser = subparsers.add_parser("sql", help="run any SQL query against the catalog")
+    sql_parser.add_argument("query")
+    sql_parser.set_defaults(func=cmd_sql)
+
+    args = parser.parse_args()
+    conn = connect(args.db)
+    try:
+        args.func(conn, args)
+    except sqlite3.Error as e:
+        print(f"Error: catalog query failed. {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
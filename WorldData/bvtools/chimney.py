@@ -0,0 +1,106 @@
+import functools
+import math
+
+from bvtools.dimensions import model_key, tallest_record
+
+# Chimney models, stripped before the stacks are rebuilt
+REMOVE_IDS = {52990, 52991, 45074, 45075, 45076, 45077}
+# Interior fireplaces that get a chimney stack outside
+FIREPLACE_IDS = {41116, 41117}
+
+
+def remove_entries(json_data):
+    def filter_records(records):
+        return [record for record in records if record.get('ModelIdNum') not in REMOVE_IDS]
+
+    if "RmbBlock" in json_data and "SubRecords" in json_data["RmbBlock"]:
+        for sub_record in json_data["RmbBlock"]["SubRecords"]:
+            if "Exterior" in sub_record:
+                sub_record["Exterior"]["Block3dObjectRecords"] = filter_records(sub_record["Exterior"]["Block3dObjectRecords"])
+            if "Interior" in sub_record:
+                sub_record["Interior"]["Block3dObjectRecords"] = filter_records(sub_record["Interior"]["Block3dObjectRecords"])
+
+    if "RmbSubRecord" in json_data and "Exterior" in json_data["RmbSubRecord"]:
+        json_data["RmbSubRecord"]["Exterior"]["Block3dObjectRecords"] = filter_records(json_data["RmbSubRecord"]["Exterior"]["Block3dObjectRecords"])
+    if "RmbSubRecord" in json_data and "Interior" in json_data["RmbSubRecord"]:
+        json_data["RmbSubRecord"]["Interior"]["Block3dObjectRecords"] = filter_records(json_data["RmbSubRecord"]["Interior"]["Block3dObjectRecords"])
+
+    return json_data
+
+
+def _isna(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+# typed: a YRotation of 90.0 must not get the template made for 90.
+@functools.lru_cache(maxsize=None, typed=True)
+def stack_template(max_y_value, max_y_rotation, exterior_y_pos, model_offset):
+    """The chimney stack above a fireplace, as the fields each of its records
+    changes in a copy of the fireplace record: the 52991 base, the 45077 top
+    and as many 45076 pieces as it takes to reach the ground.
+
+    The stack depends only on the building's tallest exterior model (its
+    height and ModelOffset), that model's YRotation and YPos, so it is worked
+    out once per (max_model_id, YRotation, exterior YPos) and reused for
+    every fireplace under the same kind of roof.
+    """
+    base = {"ModelId": "52991", "ModelIdNum": 52991, "ObjectType": 4, "YRotation": max_y_rotation}
+    if max_y_value != float('-inf'):
+        if max_y_value <= 220:
+            base["YPos"] = int(-(max_y_value + 20 - exterior_y_pos + model_offset))
+        elif max_y_value >= 300:
+            base["YPos"] = int(-(max_y_value - 80 - exterior_y_pos + model_offset))
+        else:
+            base["YPos"] = int(-(max_y_value - exterior_y_pos + model_offset))
+    else:
+        base["YPos"] = 0
+    stack = [base]
+
+    top = dict(base, ModelId="45077", ModelIdNum=45077, YPos=base["YPos"] + 129, XScale=0.9, ZScale=0.9)
+    stack.append(top)
+
+    current_y_pos = top["YPos"]
+    while current_y_pos <= 0:
+        stack.append(dict(top, ModelId="45076", ModelIdNum=45076, YPos=current_y_pos + 114))
+        current_y_pos += 114
+    return tuple(stack)
+
+
+def add_new_entries(json_data, building_dimensions, verbose=False):
+    """building_dimensions is a bvtools.dimensions table. verbose prints the
+    model each stack is measured against."""
+
+    def process_subrecord(sub_record):
+        if "Interior" in sub_record and "Exterior" in sub_record:
+            interior_records = sub_record["Interior"]["Block3dObjectRecords"]
+            exterior_records = sub_record["Exterior"]["Block3dObjectRecords"]
+
+            fireplaces = [record for record in interior_records
+                          if record.get("ModelIdNum") in FIREPLACE_IDS and record.get("YPos", 0) >= -100]
+            if fireplaces:
+                max_y_value, max_y_rotation, exterior_y_pos, max_model_id = tallest_record(exterior_records, building_dimensions)
+                dims = building_dimensions.get(model_key(max_model_id)) if max_model_id is not None else None
+                model_offset = dims.model_offset if dims is not None else 0
+                if verbose:
+                    print(f"ModelId: {max_model_id}, ModelOffset: {model_offset}")
+                    print(f"ModelId: {max_model_id}, ExteriorYPos: {exterior_y_pos}")
+
+                if _isna(max_y_value):
+                    max_y_value = 0
+                if _isna(exterior_y_pos):
+                    exterior_y_pos = 0
+                if _isna(model_offset):
+                    model_offset = 0
+
+                stack = stack_template(max_y_value, max_y_rotation, exterior_y_pos, model_offset)
+                exterior_records.extend({**fireplace, **fields} for fireplace in fireplaces for fields in stack)
+
+                sub_record["Exterior"]["Header"]["Num3dObjectRecords"] = len(exterior_records)
+
+    if "RmbBlock" in json_data and "SubRecords" in json_data["RmbBlock"]:
+        for sub_record in json_data["RmbBlock"]["SubRecords"]:
+            process_subrecord(sub_record)
+    elif "RmbSubRecord" in json_data:
+        process_subrecord(json_data["RmbSubRecord"])
+
+    return json_data
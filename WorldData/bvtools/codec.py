@@ -0,0 +1,91 @@
+import gc
+import json
+import re
+
+from bvtools import files
+
+# DFU writes some vanilla names with raw backslashes (e.g. "WEAPON.HS2\02"),
+# which are not valid JSON escapes. The decoder keeps such a backslash as a
+# literal character and the encoder writes it back unescaped, so a load/save
+# round trip reproduces the original text.
+_DECODE_BACKSLASH = re.compile(r'(\\["\\/bfnrtu])|\\')
+_ENCODE_BACKSLASH = re.compile(r'(\\\\)(?!["\\/bfnrtu])|\\.', re.DOTALL)
+_TRAILING_COMMA = re.compile(r',\s*([\]}])')
+
+
+def _escape_lone_backslash(match):
+    return match.group(1) or '\\\\'
+
+
+def _restore_lone_backslash(match):
+    return '\\' if match.group(1) else match.group(0)
+
+
+def loads(text):
+    """Decode RMB/location JSON, tolerating invalid backslash escapes.
+
+    Hand-edited files with trailing commas are retried once with the commas
+    removed. The cyclic garbage collector is paused while decoding: a large
+    block allocates hundreds of thousands of dicts, none of them cyclic.
+    """
+    return loads_repaired(text)[0]
+
+
+def loads_repaired(text):
+    """Like loads(), returning (data, repaired): repaired is True if text
+    is not valid JSON as it stands and needed its raw backslashes escaped or
+    its trailing commas removed to decode."""
+    repaired = False
+    if '\\' in text:
+        escaped = _DECODE_BACKSLASH.sub(_escape_lone_backslash, text)
+        repaired = escaped != text
+        text = escaped
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return json.loads(text), repaired
+    except json.JSONDecodeError:
+        fixed = _TRAILING_COMMA.sub(r'\1', text)
+        if fixed == text:
+            raise
+        return json.loads(fixed), True
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def dumps(data, indent=4):
+    """Encode data as JSON, restoring the raw backslashes loads() accepted."""
+    text = json.dumps(data, indent=indent)
+    if '\\' in text:
+        text = _ENCODE_BACKSLASH.sub(_restore_lone_backslash, text)
+    return text
+
+
+def load_json_file(path):
+    """Load a JSON file with loads(). Returns None if it can't be read."""
+    return load_json_file_repaired(path)[0]
+
+
+def load_json_file_repaired(path):
+    """Load a JSON file with loads_repaired(). Returns (None, False) if it
+    can't be read."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return loads_repaired(f.read())
+    except json.JSONDecodeError as e:
+        print(f"Error: Failed to decode JSON file '{path}'. {e}")
+    except Exception as e:
+        print(f"Error: Unexpected error while reading file '{path}'. {e}")
+    return None, False
+
+
+def save_json_file(path, data, indent=4):
+    """Save data with dumps(), skipping the write if the file already holds
+    exactly that text. Returns True on success."""
+    try:
+        files.write_text(path, dumps(data, indent))
+        return True
+    except Exception as e:
+        print(f"Error: Failed to save JSON file '{path}'. {e}")
+        return False
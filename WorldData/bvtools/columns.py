@@ -0,0 +1,101 @@
+"""Columnar view of Block3dObjectRecords for bulk geometry edits.
+
+RecordColumns gathers any number of record dicts (one subrecord, a block, or
+every block in the corpus) into one NumPy array per field, so an edit like
+"YPos 2 -> 0 for everything but these ModelIds" is a masked assignment
+instead of a Python loop. write_back() then copies only the values that
+changed into the original dicts, keeping each value's JSON type: a field
+that held 1 is written back as 1, not 1.0.
+
+NumPy is optional for the WorldData scripts; check available() first.
+
+    cols = RecordColumns(exterior_records(block))
+    cols["YPos"][(cols["YPos"] == 2) & ~cols.isin("ModelIdNum", EXCEPTIONS)] = 0
+    cols.write_back()
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+INT_FIELDS = ("ModelIdNum", "ObjectType", "XPos", "YPos", "ZPos", "XRotation", "YRotation", "ZRotation")
+FLOAT_FIELDS = ("XScale", "YScale", "ZScale")
+FIELDS = INT_FIELDS + FLOAT_FIELDS
+
+
+def available():
+    return np is not None
+
+
+def exterior_records(rmb_data):
+    """Every Exterior Block3dObjectRecords dict of a block, in order."""
+    for sub_record in rmb_data.get("RmbBlock", {}).get("SubRecords", []):
+        exterior = sub_record.get("Exterior")
+        if isinstance(exterior, dict):
+            yield from exterior.get("Block3dObjectRecords", [])
+
+
+class RecordColumns:
+    def __init__(self, records, fields=FIELDS):
+        if np is None:
+            raise RuntimeError("RecordColumns needs NumPy (pip install numpy)")
+        self.records = list(records)
+        self._columns = {}
+        self._original = {}
+        # Per field: which records had the key, and which held a JSON integer
+        self._present = {}
+        self._is_int = {}
+        for field in fields:
+            values = [record.get(field) for record in self.records]
+            present = np.fromiter((v is not None for v in values), dtype=bool, count=len(values))
+            is_int = np.fromiter((type(v) is int for v in values), dtype=bool, count=len(values))
+            if field in INT_FIELDS and is_int.sum() == present.sum():
+                column = np.fromiter((v if v is not None else 0 for v in values), dtype=np.int64, count=len(values))
+            else:
+                column = np.fromiter((v if v is not None else np.nan for v in values), dtype=np.float64, count=len(values))
+            self._columns[field] = column
+            self._original[field] = column.copy()
+            self._present[field] = present
+            self._is_int[field] = is_int
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, field):
+        return self._columns[field]
+
+    def __setitem__(self, field, values):
+        self._columns[field][...] = values
+
+    def present(self, field):
+        """Mask of the records that have field at all."""
+        return self._present[field]
+
+    def isin(self, field, values):
+        return np.isin(self._columns[field], list(values))
+
+    def changed(self, field):
+        """Mask of the records whose field differs from what was loaded."""
+        column, original = self._columns[field], self._original[field]
+        if column.dtype.kind == "f":
+            return ~((column == original) | (np.isnan(column) & np.isnan(original)))
+        return column != original
+
+    def write_back(self):
+        """Copy changed values into the record dicts. Returns the number of
+        records touched."""
+        touched = set()
+        for field, column in self._columns.items():
+            mask = self.changed(field)
+            is_int, present = self._is_int[field], self._present[field]
+            for i in np.flatnonzero(mask).tolist():
+                value = column[i].item()
+                if isinstance(value, float) and value.is_integer() \
+                        and (is_int[i] or (not present[i] and field in INT_FIELDS)):
+                    value = int(value)
+                self.records[i][field] = value
+                is_int[i] = type(value) is int
+                touched.add(i)
+            present |= mask
+            self._original[field] = column.copy()
+        return len(touched)
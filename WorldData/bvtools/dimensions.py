@@ -0,0 +1,74 @@
+"""BuildingDimensions.csv as a plain dict, keyed by integer ModelId.
+
+The chimney scripts look up the height of every exterior model in every
+block. A dict of tuples answers that with one hash lookup, where the pandas
+frame they used before paid for .index membership and .loc on each record.
+"""
+import csv
+import functools
+import math
+import os
+from collections import namedtuple
+
+# Y and ModelOffset are what the chimney placement uses. Sizes are in
+# Daggerfall units; ModelOffset is NaN where the CSV leaves it empty.
+Dimensions = namedtuple("Dimensions", ["x", "y", "z", "model_offset"])
+
+
+def _float(value):
+    return float(value) if value.strip() else math.nan
+
+
+@functools.lru_cache(maxsize=None)
+def _load(path, mtime_ns):
+    table = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            table[int(row["ModelId"])] = Dimensions(
+                _float(row["X"]), _float(row["Y"]), _float(row["Z"]), _float(row["ModelOffset"]))
+    return table
+
+
+def load(path="BuildingDimensions.csv"):
+    """Read the table once per process (again only if the file changes).
+    Returns None and prints the error if it can't be read."""
+    try:
+        return _load(os.path.abspath(path), os.stat(path).st_mtime_ns)
+    except Exception as e:
+        print(f"Error reading CSV file: {e}")
+        return None
+
+
+def model_key(model_id):
+    """The table key for a record's ModelId ("452" -> 452), or None.
+
+    Only canonical decimal strings match, as they did against the string
+    index of the old DataFrame; a stray " 1502" is not looked up.
+    """
+    text = str(model_id)
+    if text.isdigit() and str(int(text)) == text:
+        return int(text)
+    return None
+
+
+def tallest_record(records, table):
+    """Find the tallest model among exterior records.
+
+    Returns (height, YRotation, YPos, ModelId) of the first record with the
+    greatest height, or (-inf, 0, 0, None) if no record has dimensions.
+    """
+    max_y = float('-inf')
+    max_y_rotation = 0
+    exterior_y_pos = 0
+    max_model_id = None
+    for record in records:
+        model_id = record.get("ModelId")
+        if not model_id:
+            continue
+        dims = table.get(model_key(model_id))
+        if dims is not None and dims.y > max_y:
+            max_y = dims.y
+            max_y_rotation = record.get("YRotation", 0)
+            exterior_y_pos = record.get("YPos", 0)
+            max_model_id = str(model_id)
+    return max_y, max_y_rotation, exterior_y_pos, max_model_id
@@ -0,0 +1,58 @@
+"""Write files only when their content changes, and never leave one half written.
+
+Unity re-imports every asset whose file is touched, so rewriting a block with
+the same bytes still costs an import. write_text() compares the new content
+with what is on disk and leaves identical files alone. Changed files are
+written to a hidden temporary file next to the target and moved over it with
+os.replace(), so an interrupted run leaves either the old or the new block.
+"""
+import os
+
+stats = {"written": 0, "unchanged": 0}
+
+
+def write_text(path, text, newline=None):
+    """Write text to path as UTF-8 unless it already holds exactly that.
+
+    newline works like open()'s: None writes "\\n" as os.linesep, "" or "\\n"
+    writes it unchanged. Returns True if the file was written. Raises OSError
+    if it couldn't be.
+    """
+    if newline is None:
+        newline = os.linesep
+    if newline and newline != "\n":
+        text = text.replace("\n", newline)
+    return write_bytes(path, text.encode("utf-8"))
+
+
+def write_bytes(path, raw):
+    """Binary counterpart of write_text()."""
+    try:
+        if os.path.getsize(path) == len(raw):
+            with open(path, "rb") as f:
+                if f.read() == raw:
+                    stats["unchanged"] += 1
+                    return False
+    except OSError:
+        pass
+
+    directory, name = os.path.split(path)
+    # Dot-prefixed so Unity doesn't pick up the temporary file.
+    tmp = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(raw)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    stats["written"] += 1
+    return True
+
+
+def report():
+    if stats["written"] or stats["unchanged"]:
+        print(f"Files: {stats['written']} written, {stats['unchanged']} unchanged")
@@ -0,0 +1,98 @@
+from bvtools import patcher
+from bvtools.patcher import ANY
+
+# Exception ModelIdNum values (lower-houses.py)
+EXCEPTIONS = {444, 445, 446, 447, 20026, 20028}
+
+# ModelIdNum and YPos of every exterior model, for the text versions below
+EXTERIOR_HEIGHTS = ("RmbBlock", "SubRecords", ANY, "Exterior", "Block3dObjectRecords", ANY,
+                    frozenset({"ModelIdNum", "YPos"}))
+
+
+def exterior_3d_records(rmb_data):
+    """Yield the Exterior Block3dObjectRecords list of every subrecord."""
+    for sub_record in rmb_data.get("RmbBlock", {}).get("SubRecords", []):
+        exterior = sub_record.get("Exterior")
+        if isinstance(exterior, dict):
+            yield exterior.get("Block3dObjectRecords", [])
+
+
+def raise_houses(rmb_data):
+    """Document version of raise-houses.py: exterior YPos 2 goes back to 0.
+    Returns True if anything changed."""
+    changed = False
+    for records in exterior_3d_records(rmb_data):
+        for record in records:
+            if record.get("YPos") == 2:
+                record["YPos"] = 0
+                changed = True
+    return changed
+
+
+def lower_houses(rmb_data):
+    """Document version of lower-houses.py: exterior YPos 0 becomes 1 (1 stays
+    1), except for EXCEPTIONS, whose YPos 2 goes back to 0. Returns True if
+    anything changed."""
+    changed = False
+    for records in exterior_3d_records(rmb_data):
+        for record in records:
+            y_pos = record.get("YPos")
+            if record.get("ModelIdNum") in EXCEPTIONS:
+                if y_pos == 2:
+                    record["YPos"] = 0
+                    changed = True
+            elif y_pos == 0:
+                record["YPos"] = 1
+                changed = True
+    return changed
+
+
+# Columnar versions for bvtools.columns.RecordColumns, e.g. built over the
+# exterior records of every block at once. Same rules as above; they return
+# the number of records changed once the caller runs write_back().
+
+def raise_houses_columns(cols):
+    y_pos = cols["YPos"]
+    mask = cols.present("YPos") & (y_pos == 2)
+    y_pos[mask] = 0
+    return int(mask.sum())
+
+
+def lower_houses_columns(cols):
+    y_pos = cols["YPos"]
+    present = cols.present("YPos")
+    exceptions = cols.isin("ModelIdNum", EXCEPTIONS) & cols.present("ModelIdNum")
+    back_down = present & exceptions & (y_pos == 2)
+    lift = present & ~exceptions & (y_pos == 0)
+    y_pos[back_down] = 0
+    y_pos[lift] = 1
+    return int(back_down.sum() + lift.sum())
+
+
+# Text versions for raise-houses.py and lower-houses.py. They patch the YPos
+# values in the file's own text, so the rest of the file keeps its exact
+# formatting. Each returns (new text, number of values changed).
+
+def _exterior_heights(text):
+    for fields in patcher.group_by_parent(patcher.find(text, EXTERIOR_HEIGHTS)).values():
+        y_pos = fields.get("YPos")
+        if y_pos is None:
+            continue
+        model_id = fields.get("ModelIdNum")
+        yield (model_id.decode() if model_id else None), y_pos
+
+
+def raise_houses_text(text):
+    edits = [(y_pos, "0") for _, y_pos in _exterior_heights(text) if y_pos.decode() == 2]
+    return patcher.patch(text, edits), len(edits)
+
+
+def lower_houses_text(text):
+    edits = []
+    for model_id, y_pos in _exterior_heights(text):
+        if model_id in EXCEPTIONS:
+            if y_pos.decode() == 2:
+                edits.append((y_pos, "0"))
+        elif y_pos.decode() == 0:
+            edits.append((y_pos, "1"))
+    return patcher.patch(text, edits), len(edits)
@@ -0,0 +1,64 @@
+from bvtools.remap import Remapper
+
+# IDs to remove entirely from Block3dObjectRecords
+REMOVE_IDS = {
+    45078, 45104, 45105, 45131,
+    45079, 45106, 45107, 45132,
+    45080, 45108, 45109, 45133
+}
+
+# ModelIdNum remapping for Block3dObjectRecords
+MODEL_MAPPING = {
+    # → 41000 (Beds)
+    #42069: 41000, 42072: 41000, 42075: 41000,
+    #42078: 41000, 42081: 41000, 42084: 41000,
+    # → 41001
+    #42070: 41001, 42073: 41001, 42076: 41001,
+    #42079: 41001, 42082: 41001, 42085: 41001,
+    # → 41002
+    #42071: 41002, 42074: 41002, 42077: 41002,
+    #42080: 41002, 42083: 41002, 42086: 41002,
+    # additional remaps
+    69438: 69432, 69439: 69432,
+    69442: 69441, 69443: 69445,
+    69466: 41009,
+}
+
+# Flat texture swaps for BlockPeopleRecords
+TEXTURE_MAPPING = {
+    (1300, 3):   (182, 24),
+    (1300, 4):   (182, 10),
+    (1300, 6):   (182, 18),
+    (1300, 7):   (184, 20),
+    (1300, 8):   (182, 17),
+    (1301, 0):   (182, 41),
+    (1301, 1):   (182, 9),
+    (1301, 2):   (182, 20),
+    (1301, 3):   (184, 0),
+    (1302, 0):   (182, 11),
+    (1302, 1):   (182, 19),
+    (1302, 2):   (182, 3),
+    (1305, 0):   (184, 17),
+    (334,   0):  (184, 25),
+    (183,  11):  (184, 5),
+}
+
+INTERIOR_RULES = [
+    {"name": "3D removed", "match": "ModelIdNum", "action": "remove", "keys": REMOVE_IDS,
+     "sections": ["Interior"]},
+    {"name": "3D remapped", "match": "ModelIdNum", "action": "remap", "to": MODEL_MAPPING,
+     "sections": ["Interior"]},
+    {"name": "3D rotations reset", "match": "ModelIdNum", "action": "reset_rotation", "keys": [41009],
+     "sections": ["Interior"]},
+    # Flats using an NPC texture become people...
+    {"name": "flat moved to people", "match": "Texture", "action": "move", "to": TEXTURE_MAPPING,
+     "lists": ["BlockFlatObjectRecords"], "into": "BlockPeopleRecords", "sections": ["Interior"]},
+    # ...and people get the matching texture
+    {"name": "people textures swapped", "match": "Texture", "action": "remap", "to": TEXTURE_MAPPING,
+     "lists": ["BlockPeopleRecords"], "sections": ["Interior"]},
+]
+remapper = Remapper(INTERIOR_RULES)
+
+def process_interior(interior):
+    """Apply INTERIOR_RULES to one subrecord Interior. Returns True if it changed."""
+    return remapper.apply_section(interior, "Interior")
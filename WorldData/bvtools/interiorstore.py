@@ -0,0 +1,234 @@
+"""Content-addressed store of subrecord Interiors.
+
+random-taverns.py, random-dieps.py and diep-bcbvified.py copy the same
+tavern and DIEP interiors into many subrecords, so the blocks hold a few
+hundred distinct Interiors thousands of times over. InteriorStore keeps each
+distinct Interior once, under the SHA-1 of its compact JSON, and deduped()
+replaces the Interiors of a document with references to it:
+
+    "Interior": {"$interior": "b67cd4cd2d5f..."}
+
+expanded() puts private copies back, so code working on a document never
+sees a reference. The packed working copy (bvtools/packed.py) stores its
+documents deduped, with the store in .bvwork/interiors.sqlite, and only expands
+them when a block is loaded or exported to JSON.
+
+Interiors are keyed on their exact content, key order included, so an
+expanded document encodes to the same JSON as the original. Stored
+Interiors are never removed; delete .bvwork to start over.
+
+How many distinct Interiors the mod has, and which are shared the most:
+
+    python -m bvtools.interiorstore report [files or directories] [-j N]
+"""
+import argparse
+import hashlib
+import json
+import marshal
+import os
+import sqlite3
+import sys
+import zlib
+
+from bvtools.catalog import find_json_files
+from bvtools.codec import load_json_file
+from bvtools.parallel import add_jobs_argument, map_files, report_errors
+
+REF = "$interior"
+MARSHAL_VERSION = 4
+# Copies of the game's own files, not part of the mod.
+REFERENCE_DIRS = ("vanillarmbs", "vanillaloc")
+DFMOD_FILES = ("beautiful-villages.dfmod.json", "beautiful-cities.dfmod.json")
+
+
+def _compact(interior):
+    return json.dumps(interior, separators=(",", ":"), ensure_ascii=False)
+
+
+def interior_key(interior):
+    return hashlib.sha1(_compact(interior).encode("utf-8")).hexdigest()
+
+
+def is_ref(interior):
+    return isinstance(interior, dict) and len(interior) == 1 and REF in interior
+
+
+def sub_records(data):
+    """The subrecords of a block, building or object group document."""
+    if not isinstance(data, dict):
+        return []
+    block = data.get("RmbBlock")
+    if not isinstance(block, dict) and "FldHeader" in data and "SubRecords" in data:
+        block = data
+    if isinstance(block, dict):
+        return [sub for sub in block.get("SubRecords") or [] if isinstance(sub, dict)]
+    sub = data.get("RmbSubRecord")
+    return [sub] if isinstance(sub, dict) else []
+
+
+class InteriorStore:
+    """Interiors by key, each held once as a compressed marshal blob. With a
+    path, blobs are also kept in that SQLite database and read back on
+    demand, so the store is shared by every run on the same copy."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.blobs = {}
+        self.stats = {"bytes": 0}
+        self._conn = None
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            # A lost commit only loses Interiors no file refers to yet.
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS interiors (key TEXT PRIMARY KEY, blob BLOB NOT NULL)")
+        return self._conn
+
+    def _read(self, key):
+        row = self._db().execute("SELECT blob FROM interiors WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def __contains__(self, key):
+        return key in self.blobs or (self.path is not None and self._read(key) is not None)
+
+    def __len__(self):
+        return len(self.blobs)
+
+    def put(self, interior):
+        """Store interior if it isn't already, and return its key."""
+        key = interior_key(interior)
+        if key not in self.blobs:
+            blob = zlib.compress(marshal.dumps(interior, MARSHAL_VERSION), 1)
+            self.blobs[key] = blob
+            self.stats["bytes"] += len(blob)
+            if self.path is not None:
+                # Committed before anything can refer to it.
+                with self._db() as conn:
+                    conn.execute("INSERT OR IGNORE INTO interiors VALUES (?, ?)", (key, blob))
+        return key
+
+    def get(self, key):
+        """A private copy of the Interior stored under key. Raises KeyError
+        if there is none."""
+        blob = self.blobs.get(key)
+        if blob is None:
+            blob = self._read(key) if self.path is not None else None
+            if blob is None:
+                raise KeyError(key)
+            self.blobs[key] = blob
+            self.stats["bytes"] += len(blob)
+        return marshal.loads(zlib.decompress(blob))
+
+
+def _rebuild(data, change):
+    """A copy of data sharing everything but the dicts and lists on the way
+    to its subrecords, whose Interiors are replaced by change(interior)."""
+    if not sub_records(data):
+        return data
+    data = dict(data)
+    if isinstance(data.get("RmbSubRecord"), dict):
+        sub = data["RmbSubRecord"] = dict(data["RmbSubRecord"])
+        if isinstance(sub.get("Interior"), dict):
+            sub["Interior"] = change(sub["Interior"])
+        return data
+    block = data
+    if isinstance(data.get("RmbBlock"), dict):
+        block = data["RmbBlock"] = dict(data["RmbBlock"])
+    subs = block["SubRecords"] = list(block["SubRecords"])
+    for i, sub in enumerate(subs):
+        if isinstance(sub, dict) and isinstance(sub.get("Interior"), dict):
+            subs[i] = dict(sub, Interior=change(sub["Interior"]))
+    return data
+
+
+def deduped(data, store):
+    """data with every subrecord Interior put in store and replaced by a
+    reference to it. data itself is left as it is."""
+    return _rebuild(data, lambda interior: interior if is_ref(interior) else {REF: store.put(interior)})
+
+
+def expanded(data, store):
+    """data with every Interior reference replaced by a copy from store."""
+    return _rebuild(data, lambda interior: store.get(interior[REF]) if is_ref(interior) else interior)
+
+
+def shipped_files(dfmod_files=DFMOD_FILES):
+    """Lowercased names of the WorldData files the .dfmod manifests list."""
+    names = set()
+    for dfmod in dfmod_files:
+        data = load_json_file(dfmod) if os.path.isfile(dfmod) else None
+        for path in (data or {}).get("Files", []):
+            names.add(path.replace("\\", "/").rsplit("/", 1)[-1].lower())
+    return names
+
+
+def find_files(paths):
+    """The JSON files in paths, leaving out the vanilla reference copies
+    inside the directories given."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(f for f in find_json_files(path)
+                         if os.path.relpath(f, path).split(os.sep)[0] not in REFERENCE_DIRS)
+        elif path.endswith(".json"):
+            found.append(path)
+    return found
+
+
+def file_interiors(path):
+    """[(key, size of the compact JSON)] for the Interiors of one file.
+    Runs in the worker processes."""
+    data = load_json_file(path)
+    found = []
+    for sub in sub_records(data):
+        interior = sub.get("Interior")
+        if isinstance(interior, dict):
+            text = _compact(interior)
+            found.append((hashlib.sha1(text.encode("utf-8")).hexdigest(), len(text)))
+    return found
+
+
+def cmd_report(args):
+    paths = find_files(args.paths)
+    results = map_files(file_interiors, paths, args.jobs)
+    shipped = shipped_files()
+    uses = {}
+    sizes = {}
+    shipped_keys = set()
+    for path, result in zip(paths, results):
+        for key, size in result.result or ():
+            uses.setdefault(key, []).append(path)
+            sizes[key] = size
+            if os.path.basename(path).lower() in shipped:
+                shipped_keys.add(key)
+
+    total = sum(len(files) for files in uses.values())
+    total_mb = sum(sizes[key] * len(files) for key, files in uses.items()) / (1024 * 1024)
+    distinct_mb = sum(sizes.values()) / (1024 * 1024)
+    print(f"{total} Interiors in {len(paths)} files, {len(uses)} distinct")
+    print(f"  {total_mb:.1f} MB of Interior JSON, {distinct_mb:.1f} MB with each distinct one once")
+    print(f"  {len(shipped_keys)} distinct Interiors in the files the .dfmod manifests ship")
+    if args.top:
+        print("Most shared:")
+        for key, files in sorted(uses.items(), key=lambda item: (-len(item[1]), item[0]))[:args.top]:
+            print(f"  {key[:12]}  {len(files):4} copies  {sizes[key] / 1024:7.1f} KB  e.g. {files[0]}")
+    return 1 if report_errors(results) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-addressed store of subrecord Interiors.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report_parser = subparsers.add_parser("report", help="count the distinct Interiors and the most shared ones")
+    report_parser.add_argument("paths", nargs="*", default=["."], help="files or directories (default: .)")
+    report_parser.add_argument("--top", type=int, default=10, help="list the N most shared Interiors (default: 10)")
+    add_jobs_argument(report_parser)
+    report_parser.set_defaults(func=cmd_report)
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""Hand out a location's vanilla building data to its rebuilt buildings.
+
+fix-builds.py gives every building of a location the NameSeed, Quality and
+Sector of a vanilla building of the same BuildingType, preferably one with
+the same FactionId too. VanillaBuildings keeps one queue of unused vanilla
+buildings per (BuildingType, FactionId) and one per BuildingType, so each
+vanilla building is handed out once and every lookup is O(1) amortized.
+SectorAllocator makes sure no two buildings of the location share a Sector.
+"""
+from collections import deque
+
+# Vanilla Sectors are spaced this far apart; new ones keep the spacing.
+SECTOR_STEP = 3
+
+
+def normalize_faction(faction_id):
+    """FactionIds 26 and 92 count as the same faction."""
+    return 26 if faction_id in (26, 92) else faction_id
+
+
+class SectorAllocator:
+    """Unique Sectors for one location.
+
+    Vanilla Sectors are claimed as buildings take them. Buildings without
+    one, or whose vanilla Sector is already taken, get a new Sector from the
+    free list: the slots past every vanilla Sector, in SECTOR_STEP steps,
+    which no vanilla building can claim later.
+    """
+
+    def __init__(self, vanilla_sectors=()):
+        self.used = set()
+        self.next_free = max(vanilla_sectors, default=0) + SECTOR_STEP
+
+    def claim(self, sector):
+        """Return sector if nobody has it yet, else a new one."""
+        if sector is None or sector in self.used:
+            return self.allocate()
+        self.used.add(sector)
+        return sector
+
+    def allocate(self):
+        # next_free only moves forward, so allocating is O(1) amortized.
+        while self.next_free in self.used:
+            self.next_free += SECTOR_STEP
+        sector = self.next_free
+        self.used.add(sector)
+        self.next_free += SECTOR_STEP
+        return sector
+
+
+class VanillaBuildings:
+    """The unused vanilla buildings of a location, queued in file order.
+
+    normalize_type(value) turns a BuildingType (a number in blocks, a name in
+    location files) into the form both sides are compared in.
+    """
+
+    def __init__(self, buildings, normalize_type):
+        self.entries = []
+        self.by_type_faction = {}
+        self.by_type = {}
+        for building in buildings:
+            index = len(self.entries)
+            self.entries.append(building)
+            key = normalize_type(building.get('BuildingType'))
+            faction = normalize_faction(building.get('FactionId', 0))
+            self.by_type_faction.setdefault((key, faction), deque()).append(index)
+            self.by_type.setdefault(key, deque()).append(index)
+        # An entry sits in two queues; the flag keeps it from being handed
+        # out twice. Each queue drops taken entries as it reaches them.
+        self.taken = bytearray(len(self.entries))
+        self.sectors = SectorAllocator(
+            b['Sector'] for b in buildings if isinstance(b.get('Sector'), int))
+
+    def _take_from(self, queue):
+        while queue:
+            index = queue.popleft()
+            if not self.taken[index]:
+                self.taken[index] = 1
+                return self.entries[index]
+        return None
+
+    def take(self, building_type, faction_id):
+        """Remove and return the first unused vanilla building of this type
+        and (normalized) faction, else of this type, else None."""
+        faction = normalize_faction(faction_id)
+        building = self._take_from(self.by_type_faction.get((building_type, faction)))
+        if building is None:
+            building = self._take_from(self.by_type.get(building_type))
+        return building
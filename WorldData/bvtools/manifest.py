@@ -0,0 +1,121 @@
+"""Build manifest for incremental pipeline runs.
+
+For every block the pipeline has processed, the manifest records the hash of
+the block as it was left on disk, the passes that ran, a signature of what
+those passes could choose from (override names, template listings, ...) and
+the hash of every input file they actually read: the building overrides,
+tavern and DIEP templates applied to the block, BuildingDimensions.csv.
+
+On the next run a block is skipped when all of those still match, so after
+editing one template only the blocks that used it are rebuilt. The manifest
+is kept in .bvcache/manifest.json; delete it or run the pipeline with --force
+to rebuild everything.
+"""
+import hashlib
+import json
+import os
+
+from bvtools import cache
+
+# Bump when the manifest layout changes so old manifests are ignored.
+MANIFEST_VERSION = 1
+
+MANIFEST_PATH = os.path.join(cache.CACHE_DIR, "manifest.json")
+
+BVTOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def hash_bytes(raw):
+    return hashlib.sha1(raw).hexdigest()
+
+
+def hash_text(text):
+    return hash_bytes(text.encode("utf-8"))
+
+
+def code_version():
+    """Hash of the bvtools sources, so editing a pass rebuilds every block."""
+    h = hashlib.sha1()
+    for name in sorted(os.listdir(BVTOOLS_DIR)):
+        if name.endswith(".py"):
+            h.update(name.encode("utf-8"))
+            with open(os.path.join(BVTOOLS_DIR, name), "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+class Manifest:
+    def __init__(self, path=MANIFEST_PATH, directory="."):
+        self.path = path
+        self.directory = directory
+        self.blocks = {}
+        self.code = code_version()
+        # path -> ((size, mtime_ns), sha1), so each input is hashed once per run
+        self._digests = {}
+
+    def key(self, path):
+        return os.path.relpath(path, self.directory).replace(os.sep, "/")
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Warning: ignoring unreadable build manifest '{self.path}'. {e}")
+            return
+        if saved.get("version") == MANIFEST_VERSION and saved.get("code") == self.code:
+            self.blocks = saved.get("blocks", {})
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "code": self.code, "blocks": self.blocks},
+                      f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def digest(self, path):
+        """SHA-1 of a file, or None if it is missing."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stamp = (st.st_size, st.st_mtime_ns)
+        known = self._digests.get(path)
+        if known and known[0] == stamp:
+            return known[1]
+        with open(path, "rb") as f:
+            digest = hash_bytes(f.read())
+        self._digests[path] = (stamp, digest)
+        return digest
+
+    def is_fresh(self, path, signature, output=None):
+        """True if path was built with this signature and neither it nor any
+        input it read has changed since. output is the file the block was
+        saved to, if not path itself (e.g. its packed working copy)."""
+        entry = self.blocks.get(self.key(path))
+        if not entry or entry.get("signature") != signature:
+            return False
+        if self.digest(output or path) != entry.get("output"):
+            return False
+        for input_key, digest in entry.get("inputs", {}).items():
+            if self.digest(os.path.join(self.directory, input_key)) != digest:
+                return False
+        return True
+
+    def record(self, path, signature, inputs, notes=None, output=None):
+        """Record a processed block and the input files it read."""
+        output = output or path
+        # The block was probably just rewritten; don't trust the stat memo.
+        self._digests.pop(output, None)
+        self.blocks[self.key(path)] = {
+            "signature": signature,
+            "output": self.digest(output),
+            "inputs": {self.key(p): self.digest(p) for p in sorted(inputs)},
+            "notes": notes or {},
+        }
+
+    def notes(self, path):
+        return self.blocks.get(self.key(path), {}).get("notes", {})
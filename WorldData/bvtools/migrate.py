@@ -0,0 +1,13 @@
+from bvtools.remap import Remapper
+
+# Move the TextureArchives 1002-1070 up by 9000, wherever a flat uses them.
+# Shared by migrate-det.py and diep/migrate-det.py.
+MIGRATE_RULES = [
+    {"match": "TextureArchive", "action": "offset", "keys": range(1002, 1071), "by": 9000},
+]
+remapper = Remapper(MIGRATE_RULES)
+
+def update_texture_archives(data):
+    """Apply MIGRATE_RULES to a block, building or subrecord document.
+    Returns True if it changed."""
+    return remapper.apply(data)
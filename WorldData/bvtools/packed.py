@@ -0,0 +1,296 @@
+"""Compact binary working copy of the WorldData JSON.
+
+The JSON is mostly indentation and repeated keys. A packed file holds the
+decoded document as a zlib-compressed marshal stream: marshal writes each
+interned key ("ModelIdNum", "XRotation", ...) once per file and refers back to
+it afterwards, and zlib takes care of the rest. The blocks shrink to about a
+twentieth of their size, and loading or saving one skips the JSON decoder
+and the pure-Python indenting encoder.
+
+Every packed file also records how to write the exact original JSON back:
+the indent (2 or 4) when codec.dumps() reproduces the file byte-for-byte,
+otherwise the original text itself (DFU-native files, CRLF files, ...).
+Files packed from JSON keep the SHA-1 of that JSON, so exporting skips the
+ones nobody has changed since. They also keep it as their base, the JSON
+they were derived from, through every save. If the JSON no longer matches
+the base, someone edited it after it was packed (e.g. with one of the
+standalone scripts): load() refuses the packed copy and export leaves that
+file alone, unless it is repacked or exported with --force.
+
+Subrecord Interiors are kept once per distinct content in .bvwork/interiors.sqlite
+(see bvtools/interiorstore.py) and packed files only refer to them; load()
+and export() put them back.
+
+The working copy lives in .bvwork/, mirroring the paths under WorldData, and
+is never read by Unity or DFU. Run from the WorldData directory:
+
+    python -m bvtools.packed pack              # JSON -> .bvwork
+    python -m bvtools.pipeline --packed        # work on the packed copy
+    python -m bvtools.packed export            # .bvwork -> JSON
+    python -m bvtools.packed verify            # check every export is exact
+"""
+import argparse
+import hashlib
+import marshal
+import os
+import sys
+import zlib
+
+from bvtools import codec, files, interiorstore
+
+MAGIC = b"BVPK"
+# 2: Interiors are references into the interior store.
+FORMAT_VERSION = 2
+# marshal format 4 is read by every Python 3.4+ and stores repeated strings
+# as back-references.
+MARSHAL_VERSION = 4
+
+WORK_DIR = os.environ.get("BVTOOLS_WORK_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".bvwork")
+SUFFIX = ".bvpk"
+INTERIORS_PATH = os.path.join(WORK_DIR, "interiors.sqlite")
+
+_interiors = None
+
+
+def interior_store():
+    """The working copy's interior store, opened on first use."""
+    global _interiors
+    if _interiors is None:
+        _interiors = interiorstore.InteriorStore(INTERIORS_PATH)
+    return _interiors
+
+
+def detect_indent(text, data):
+    """The indent codec.dumps() needs to reproduce text exactly, or None."""
+    # The first indented line says which one to try; encoding is the slow part.
+    second_line = text[text.find("\n") + 1:]
+    guess = len(second_line) - len(second_line.lstrip(" "))
+    if guess not in (2, 4):
+        return None
+    return guess if codec.dumps(data, guess) == text else None
+
+
+def pack(data, indent=4, text=None, source=None, base=None):
+    """Encode a document. text, if given, is stored verbatim and exported
+    instead of re-encoding data. source is the SHA-1 of the JSON file the
+    document is known to match, if any, and base that of the JSON it was
+    derived from (source by default). Its Interiors go to the interior
+    store."""
+    data = interiorstore.deduped(data, interior_store())
+    payload = marshal.dumps({"indent": indent, "text": text, "source": source, "base": base or source,
+                             "data": data}, MARSHAL_VERSION)
+    return MAGIC + bytes([FORMAT_VERSION]) + zlib.compress(payload, 1)
+
+
+def pack_text(text, raw=None):
+    """Pack a JSON document so that export() gives back exactly text. raw is
+    the file's bytes, if text was read from one."""
+    data = codec.loads(text)
+    indent = detect_indent(text, data)
+    source = hashlib.sha1(raw).hexdigest() if raw is not None else None
+    return pack(data, indent or 4, None if indent else text, source)
+
+
+def unpack(raw):
+    """Return {"indent": ..., "text": ..., "source": ..., "base": ..., "data": ...},
+    data still holding references to the interior store."""
+    if raw[:4] != MAGIC:
+        raise ValueError("not a packed WorldData file")
+    # Format 1 is format 2 without any references.
+    if raw[4] not in (1, FORMAT_VERSION):
+        raise ValueError(f"packed format {raw[4]} is not supported (expected {FORMAT_VERSION})")
+    entry = marshal.loads(zlib.decompress(raw[5:]))
+    entry.setdefault("base", entry["source"])
+    return entry
+
+
+def file_sha1(path):
+    """SHA-1 of the file at path, or None if there is none."""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def is_stale(entry, sha1):
+    """True if the JSON, whose SHA-1 is sha1 (None if it doesn't exist), was
+    changed after entry was packed from it."""
+    return bool(entry["base"]) and sha1 is not None and sha1 != entry["base"]
+
+
+def export(entry):
+    """The bytes of the JSON file an unpacked entry stands for. Stored text
+    already holds the file's own line endings; re-encoded text gets the
+    platform's, like any other save (see files.write_text())."""
+    if entry["text"] is not None:
+        return entry["text"].encode("utf-8")
+    text = codec.dumps(interiorstore.expanded(entry["data"], interior_store()), entry["indent"])
+    if os.linesep != "\n":
+        text = text.replace("\n", os.linesep)
+    return text.encode("utf-8")
+
+
+def working_path(path, directory="."):
+    """.bvwork path of a JSON file under directory."""
+    rel = os.path.relpath(os.path.abspath(path), os.path.abspath(directory))
+    return os.path.join(WORK_DIR, rel + SUFFIX)
+
+
+def json_path(work_path, directory="."):
+    rel = os.path.relpath(work_path, WORK_DIR)
+    return os.path.join(directory, rel[:-len(SUFFIX)])
+
+
+def load(path, directory="."):
+    """Load the document for JSON path from the working copy if there is
+    one, else from the JSON itself. Returns None if neither can be read, or
+    if the JSON was edited after it was packed."""
+    work = working_path(path, directory)
+    try:
+        with open(work, "rb") as f:
+            entry = unpack(f.read())
+        if is_stale(entry, file_sha1(path)):
+            print(f"Error: '{path}' changed since it was packed. Repack it with python -m bvtools.packed pack.")
+            return None
+        return interiorstore.expanded(entry["data"], interior_store())
+    except FileNotFoundError:
+        return codec.load_json_file(path)
+    except Exception as e:
+        print(f"Error: Failed to read packed file '{work}'. {e}")
+        return None
+
+
+def save(path, data, indent=4, directory="."):
+    """Save data to the working copy of JSON path. Returns True on success."""
+    work = working_path(path, directory)
+    try:
+        # Keep the base of the copy being replaced, or take the JSON's if
+        # the document came from the JSON itself.
+        try:
+            with open(work, "rb") as f:
+                base = unpack(f.read())["base"]
+        except FileNotFoundError:
+            base = file_sha1(path)
+        os.makedirs(os.path.dirname(work), exist_ok=True)
+        files.write_bytes(work, pack(data, indent, base=base))
+        return True
+    except Exception as e:
+        print(f"Error: Failed to save packed file '{work}'. {e}")
+        return False
+
+
+def find_json(paths):
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs[:] = [d for d in dirs if not d.startswith(".")]
+                found.extend(os.path.join(root, name) for name in names if name.endswith(".json"))
+        elif path.endswith(".json"):
+            found.append(path)
+    return sorted(found)
+
+
+def find_packed(paths):
+    found = []
+    for path in paths:
+        work = working_path(path) if not os.path.isdir(path) else os.path.join(
+            WORK_DIR, os.path.relpath(os.path.abspath(path), os.path.abspath(".")))
+        if os.path.isdir(work):
+            for root, _, names in os.walk(work):
+                found.extend(os.path.join(root, name) for name in names if name.endswith(SUFFIX))
+        elif os.path.isfile(work):
+            found.append(work)
+    return sorted(found)
+
+
+def cmd_pack(args):
+    json_bytes = packed_bytes = 0
+    for path in find_json(args.paths):
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+            packed = pack_text(raw.decode("utf-8"), raw)
+        except Exception as e:
+            print(f"Error: Failed to pack '{path}'. {e}")
+            continue
+        work = working_path(path)
+        os.makedirs(os.path.dirname(work), exist_ok=True)
+        files.write_bytes(work, packed)
+        json_bytes += len(raw)
+        packed_bytes += len(packed)
+    if json_bytes:
+        store = interior_store()
+        print(f"Packed {json_bytes / (1024 * 1024):.1f} MB of JSON into {packed_bytes / (1024 * 1024):.1f} MB, "
+              f"plus {len(store)} distinct Interiors in {store.stats['bytes'] / (1024 * 1024):.1f} MB")
+    files.report()
+
+
+def cmd_export(args):
+    stale = 0
+    for work in find_packed(args.paths):
+        path = json_path(work)
+        try:
+            with open(work, "rb") as f:
+                entry = unpack(f.read())
+            sha1 = file_sha1(path)
+            if entry["source"] and sha1 == entry["source"]:
+                files.stats["unchanged"] += 1
+                continue
+            if is_stale(entry, sha1) and not args.force:
+                print(f"Error: '{path}' changed since it was packed; not overwriting it. "
+                      f"Repack it, or export with --force to discard the edit.")
+                stale += 1
+                continue
+            raw = export(entry)
+            if files.write_bytes(path, raw):
+                print(f"Exported: {path}")
+            # Remember that the JSON now matches, so the next export can skip it.
+            files.write_bytes(work, pack(entry["data"], entry["indent"], entry["text"],
+                                         hashlib.sha1(raw).hexdigest()))
+        except Exception as e:
+            print(f"Error: Failed to export '{work}'. {e}")
+    files.report()
+    return 1 if stale else 0
+
+
+def cmd_verify(args):
+    failed = 0
+    checked = 0
+    for path in find_json(args.paths):
+        work = working_path(path)
+        if not os.path.isfile(work):
+            continue
+        checked += 1
+        with open(path, "rb") as f:
+            original = f.read()
+        with open(work, "rb") as f:
+            exported = export(unpack(f.read()))
+        if exported != original:
+            failed += 1
+            print(f"Differs: {path}")
+    print(f"{checked - failed} of {checked} packed files export to their JSON byte-for-byte")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the packed working copy in .bvwork.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, func, help_text in (
+            ("pack", cmd_pack, "pack JSON files into the working copy"),
+            ("export", cmd_export, "write the working copy back out as JSON"),
+            ("verify", cmd_verify, "check the working copy exports to the current JSON exactly")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("paths", nargs="*", default=["."], help="files or directories (default: .)")
+        if func is cmd_export:
+            sub.add_argument("--force", action="store_true",
+                             help="also overwrite JSON files edited since they were packed")
+        sub.set_defaults(func=func)
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Fan per-file work out over a process pool.
+
+Scripts that handle each file independently pass their per-file function to
+map_files(). With jobs > 1 the files are spread over worker processes; what
+each call prints is captured and replayed in input order, so the log reads
+the same as a serial run.
+
+Per-file functions must be defined at module level, and scripts must keep
+their top-level work under `if __name__ == "__main__":`, because on Windows
+the workers re-import the script.
+"""
+import contextlib
+import io
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from bvtools import cache, files
+
+# Counters kept by the workers and added back into the parent's.
+STATS = {"cache": cache.stats, "files": files.stats}
+
+
+def add_jobs_argument(parser):
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="worker processes; 0 uses every core (default: 1)")
+
+
+def resolve_jobs(jobs):
+    if jobs is None or jobs < 0:
+        return 1
+    return jobs or os.cpu_count() or 1
+
+
+class FileResult:
+    def __init__(self, item, result=None, error=None, output=""):
+        self.item = item
+        self.result = result
+        self.error = error
+        self.output = output
+
+
+def run_captured(func, item):
+    """Call func(item) in a worker, capturing its output and any exception."""
+    before = {name: dict(counters) for name, counters in STATS.items()}
+    buffer = io.StringIO()
+    result = error = None
+    with contextlib.redirect_stdout(buffer):
+        try:
+            result = func(item)
+        except Exception:
+            error = traceback.format_exc()
+    stats = {name: {key: counters[key] - before[name].get(key, 0) for key in counters}
+             for name, counters in STATS.items()}
+    return FileResult(item, result, error, buffer.getvalue()), stats
+
+
+def map_files(func, items, jobs=1, chunksize=4):
+    """Call func(item) for every item and return a FileResult per item, in
+    input order. An exception in one call is recorded on its FileResult and
+    does not stop the others."""
+    items = list(items)
+    jobs = min(resolve_jobs(jobs), max(len(items), 1))
+    results = []
+
+    if jobs == 1:
+        for item in items:
+            try:
+                results.append(FileResult(item, func(item)))
+            except Exception:
+                error = traceback.format_exc()
+                print(error, end="")
+                results.append(FileResult(item, error=error))
+        return results
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for file_result, stats in executor.map(run_captured, [func] * len(items), items, chunksize=chunksize):
+            print(file_result.output, end="")
+            if file_result.error:
+                print(file_result.error, end="")
+            for name, counters in stats.items():
+                for key, value in counters.items():
+                    STATS[name][key] = STATS[name].get(key, 0) + value
+            results.append(file_result)
+    return results
+
+
+def report_errors(results):
+    """Print a summary line for every item that raised. Returns the count."""
+    failed = [r for r in results if r.error]
+    if failed:
+        print(f"{len(failed)} file(s) failed:")
+        for r in failed:
+            label = r.item[0] if isinstance(r.item, tuple) else r.item
+            print(f"  {label}: {r.error.strip().splitlines()[-1]}")
+    return len(failed)
@@ -0,0 +1,156 @@
+"""The pipeline passes, in build order. Each wraps the logic of one of the
+standalone WorldData scripts."""
+import os
+
+from bvtools import dimensions, rng
+from bvtools.buildings import (
+    HOUSE_MODEL_IDS, apply_building, assign_houses, assign_taverns, block_name,
+    group_templates, index_building_overrides, load_mod_list, overrides_by_block,
+    write_diep_mappings,
+)
+from bvtools.chimney import add_new_entries, remove_entries
+from bvtools.heights import raise_houses
+from bvtools.interiors import process_interior
+from bvtools.manifest import hash_text
+from bvtools.pipeline import register_pass
+from bvtools.positions import PositionRegistry, assign_zero_positions, zero_position_holders
+
+
+def load_overrides(ctx):
+    """Index buildings/ once per run; merge, taverns and dieps share it."""
+    if not hasattr(ctx, "building_overrides"):
+        ctx.building_overrides = index_building_overrides(os.path.join(ctx.directory, "buildings"))
+        ctx.overrides_by_block = overrides_by_block(ctx.building_overrides)
+
+
+def block_overrides(ctx, path):
+    return ctx.overrides_by_block.get(block_name(path), [])
+
+
+@register_pass("merge", setup=load_overrides, signature=lambda ctx, path: repr(block_overrides(ctx, path)))
+def merge_pass(ctx, path, data):
+    """Apply buildings/*.RMB-N-buildingI.json overrides (merge-buildings.py)."""
+    rmb_file = os.path.basename(path)
+    changed = False
+    for building_file, index in block_overrides(ctx, path):
+        print(f"Applying replacement: {building_file} -> {rmb_file} at position {index}")
+        building_data = ctx.load_input(building_file)
+        if building_data and apply_building(data, building_data, index, rmb_file):
+            changed = True
+    return changed
+
+
+def setup_taverns(ctx):
+    load_overrides(ctx)
+    ctx.taverns_by_model_id = group_templates(os.path.join(ctx.directory, "taverns"), r"tavern-(\d+)-\d+\.json")
+    ctx.taverns_signature = hash_text(repr(sorted(ctx.taverns_by_model_id.items())))
+
+
+def taverns_signature(ctx, path):
+    return f"{ctx.taverns_signature} {ctx.seed} {block_overrides(ctx, path)!r}"
+
+
+@register_pass("taverns", setup=setup_taverns, signature=taverns_signature)
+def taverns_pass(ctx, path, data):
+    """Assign random tavern templates (random-taverns.py)."""
+    return assign_taverns(os.path.basename(path), data, ctx.taverns_by_model_id, ctx.building_overrides,
+                          load=ctx.load_template, seed=ctx.seed)
+
+
+def setup_dieps(ctx):
+    load_overrides(ctx)
+    ctx.mod_rmbs = set()
+    for modfile in ("beautiful-cities.dfmod.json", "beautiful-villages.dfmod.json"):
+        modfile = os.path.join(ctx.directory, modfile)
+        if os.path.isfile(modfile):
+            ctx.mod_rmbs |= load_mod_list(modfile)
+    ctx.diep_by_model = group_templates(os.path.join(ctx.directory, "diep"), r"diep-(\d+)-\d+\.json$", HOUSE_MODEL_IDS)
+    ctx.diep_mappings = []
+    ctx.dieps_signature = hash_text(repr(sorted(ctx.diep_by_model.items())))
+
+
+def finish_dieps(ctx):
+    write_diep_mappings(ctx.diep_mappings, os.path.join(ctx.directory, "bcbv_diep_mappings.csv"))
+
+
+def dieps_signature(ctx, path):
+    in_mod = os.path.basename(path).lower() in ctx.mod_rmbs
+    return f"{ctx.dieps_signature} {ctx.seed} {in_mod} {block_overrides(ctx, path)!r}"
+
+
+def restore_dieps(ctx, path, notes):
+    # A skipped block keeps the interiors it was given last time, so its rows
+    # still belong in the mappings CSV.
+    ctx.diep_mappings.extend(tuple(row) for row in notes or [])
+
+
+@register_pass("dieps", setup=setup_dieps, finish=finish_dieps, signature=dieps_signature, restore=restore_dieps)
+def dieps_pass(ctx, path, data):
+    """Assign random DIEP house interiors (random-dieps.py)."""
+    before = len(ctx.diep_mappings)
+    changed = assign_houses(os.path.basename(path), data, ctx.diep_by_model, ctx.building_overrides,
+                            ctx.mod_rmbs, ctx.diep_mappings, load=ctx.load_template, seed=ctx.seed)
+    ctx.notes["dieps"] = ctx.diep_mappings[before:]
+    return changed
+
+
+@register_pass("interiors")
+def interiors_pass(ctx, path, data):
+    """Remap and remove interior models and NPC flats (diep-bcbvified.py)."""
+    changed = False
+    for sub in data.get("RmbBlock", {}).get("SubRecords", []):
+        if process_interior(sub.get("Interior", {})):
+            changed = True
+    return changed
+
+
+def setup_chimney(ctx):
+    ctx.building_dimensions_path = os.path.join(ctx.directory, "BuildingDimensions.csv")
+    ctx.building_dimensions = dimensions.load(ctx.building_dimensions_path)
+
+
+@register_pass("chimney", setup=setup_chimney)
+def chimney_pass(ctx, path, data):
+    """Rebuild chimney stacks above interior fireplaces (autochimney.py)."""
+    ctx.add_input(ctx.building_dimensions_path)
+    remove_entries(data)
+    add_new_entries(data, ctx.building_dimensions)
+    # Chimney records are always removed and re-added, as autochimney.py
+    # does, so the block counts as changed.
+    return True
+
+
+def setup_npcs(ctx):
+    ctx.positions = PositionRegistry()
+    ctx.positions.refresh()
+
+
+def finish_npcs(ctx):
+    # Record what the saved blocks use now; the leases are kept either way.
+    ctx.positions.refresh()
+    ctx.positions.save()
+
+
+def npcs_signature(ctx, path):
+    return str(ctx.seed)
+
+
+@register_pass("npcs", setup=setup_npcs, finish=finish_npcs, signature=npcs_signature)
+def npcs_pass(ctx, path, data):
+    """Give every "Position": 0 a unique value (fix-npcs.py)."""
+    count = sum(1 for _ in zero_position_holders(data))
+    if not count:
+        return False
+    # A block of its own from the registry, as fix-npcs.py leases per file,
+    # so values are unique across the mod and across incremental runs.
+    new_positions = list(ctx.positions.lease(count))
+    rng.stream(ctx.seed, "positions", os.path.basename(path)).shuffle(new_positions)
+    # assign_zero_positions() pops from the end
+    new_positions.reverse()
+    return assign_zero_positions(data, new_positions) > 0
+
+
+@register_pass("raise")
+def raise_pass(ctx, path, data):
+    """Put exterior models at YPos 2 back to 0 (raise-houses.py)."""
+    return raise_houses(data)
@@ -0,0 +1,211 @@
+"""Edit values in JSON text in place, keeping everything else byte-for-byte.
+
+find() tokenizes a document once and returns the byte range of every scalar
+whose path matches a pattern, e.g.
+
+    ("RmbBlock", "SubRecords", ANY, "Exterior", "Block3dObjectRecords", ANY, {"ModelIdNum", "YPos"})
+
+matches RmbBlock.SubRecords[i].Exterior.Block3dObjectRecords[j].YPos (and
+.ModelIdNum). Each pattern element is a key, an index, ANY, or a set of
+keys/indices. Containers that can't match are skipped without tokenizing
+their contents.
+
+patch() then splices replacement values into those ranges. Indentation,
+key order, number formatting and the raw backslashes DFU writes all stay as
+they were, and there is no decode/encode round trip.
+"""
+import json
+import re
+
+ANY = "*"
+
+_WS = re.compile(r'[ \t\r\n]*')
+# Strings may hold the invalid escapes DFU writes (see codec.py); "\\." takes
+# any escaped character so they don't end the string early.
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_SCALAR = re.compile(r'[^\s,\]}]+')
+_SKIP = re.compile(r'"(?:[^"\\]|\\.)*"|[\[\]{}]', re.DOTALL)
+
+_decoder = json.JSONDecoder()
+
+
+def _skip_indented(text, pos):
+    """End of the pretty-printed container opening at pos, or -1.
+
+    DFU and codec.dumps() put every member on its own line and the closing
+    bracket on a line indented like the one that opened the container. No
+    JSON string holds a raw newline, so the first such line after pos is the
+    closing one, and str.find() gets there without looking at the contents.
+    """
+    close = '}' if text[pos] == '{' else ']'
+    line_start = text.rfind('\n', 0, pos) + 1
+    line = text[line_start:pos]
+    indent = len(line) - len(line.lstrip(' '))
+    body = _WS.match(text, pos + 1)
+    if text[body.end()] == close:
+        return body.end() + 1
+    if '\n' not in body.group():
+        return -1
+    closer = '\n' + ' ' * indent + close
+    # Members must sit deeper than the bracket's line, or this isn't the
+    # layout the shortcut relies on.
+    if body.end() - text.rfind('\n', 0, body.end()) - 1 <= indent:
+        return -1
+    end = text.find(closer, body.end())
+    return end + len(closer) if end >= 0 else -1
+
+
+def skip(text, pos):
+    """Return the offset just past the value starting at pos (which must not
+    be whitespace)."""
+    c = text[pos]
+    if c == '"':
+        return _STRING.match(text, pos).end()
+    if c not in '{[':
+        return _SCALAR.match(text, pos).end()
+    end = _skip_indented(text, pos)
+    if end >= 0:
+        return end
+    # The C decoder finds the end of a well-formed container far faster
+    # than the token loop below, which handles the rest (raw backslashes,
+    # trailing commas).
+    try:
+        return _decoder.raw_decode(text, pos)[1]
+    except ValueError:
+        pass
+    depth = 0
+    for m in _SKIP.finditer(text, pos):
+        token = m.group()
+        if token in '{[':
+            depth += 1
+        elif token in '}]':
+            depth -= 1
+            if depth == 0:
+                return m.end()
+    raise ValueError(f"Unterminated container at offset {pos}")
+
+
+class Value:
+    """A matched scalar: its path, its [start, end) offsets and raw text."""
+    __slots__ = ("path", "start", "end", "raw")
+
+    def __init__(self, path, start, end, raw):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.raw = raw
+
+    def decode(self):
+        return json.loads(self.raw)
+
+    def __repr__(self):
+        return f"Value({self.path!r}, {self.start}, {self.end}, {self.raw!r})"
+
+
+def _matches(element, key):
+    if element == ANY:
+        return True
+    if isinstance(element, (set, frozenset, tuple)):
+        return key in element
+    return element == key
+
+
+class _Scanner:
+    def __init__(self, text, pattern):
+        self.text = text
+        self.pattern = tuple(pattern)
+        self.found = []
+
+    def ws(self, pos):
+        return _WS.match(self.text, pos).end()
+
+    def skip(self, pos):
+        """Return the offset just past the value starting at pos."""
+        return skip(self.text, self.ws(pos))
+
+    def value(self, pos, path):
+        text = self.text
+        pos = self.ws(pos)
+        c = text[pos]
+        depth = len(path)
+        if c == '{' or c == '[':
+            if depth >= len(self.pattern):
+                return self.skip(pos)
+            return self.object(pos + 1, path) if c == '{' else self.array(pos + 1, path)
+        m = _STRING.match(text, pos) if c == '"' else _SCALAR.match(text, pos)
+        if m is None:
+            raise ValueError(f"Unexpected {c!r} at offset {pos}")
+        if depth == len(self.pattern):
+            self.found.append(Value(path, pos, m.end(), m.group()))
+        return m.end()
+
+    def object(self, pos, path):
+        text = self.text
+        element = self.pattern[len(path)]
+        while True:
+            pos = self.ws(pos)
+            c = text[pos]
+            if c == '}':
+                return pos + 1
+            if c == ',':
+                pos += 1
+                continue
+            m = _STRING.match(text, pos)
+            if m is None:
+                raise ValueError(f"Expected a key at offset {pos}")
+            key = m.group()[1:-1]
+            pos = self.ws(m.end())
+            if text[pos] != ':':
+                raise ValueError(f"Expected ':' at offset {pos}")
+            if _matches(element, key):
+                pos = self.value(pos + 1, path + (key,))
+            else:
+                pos = self.skip(pos + 1)
+
+    def array(self, pos, path):
+        text = self.text
+        element = self.pattern[len(path)]
+        index = 0
+        while True:
+            pos = self.ws(pos)
+            c = text[pos]
+            if c == ']':
+                return pos + 1
+            if c == ',':
+                pos += 1
+                continue
+            if _matches(element, index):
+                pos = self.value(pos, path + (index,))
+            else:
+                pos = self.skip(pos)
+            index += 1
+
+
+def find(text, pattern):
+    """Return a Value for every scalar in text whose path matches pattern,
+    in document order."""
+    scanner = _Scanner(text, pattern)
+    scanner.value(0, ())
+    return scanner.found
+
+
+def patch(text, edits):
+    """Apply edits, a list of (Value, replacement text), and return the new
+    text. Only the edited ranges change."""
+    parts = []
+    pos = 0
+    for value, replacement in sorted(edits, key=lambda edit: edit[0].start):
+        parts.append(text[pos:value.start])
+        parts.append(replacement)
+        pos = value.end
+    parts.append(text[pos:])
+    return "".join(parts)
+
+
+def group_by_parent(values):
+    """Group matched values by the object holding them:
+    {parent path: {key: Value}}, in document order."""
+    groups = {}
+    for value in values:
+        groups.setdefault(value.path[:-1], {})[value.path[-1]] = value
+    return groups
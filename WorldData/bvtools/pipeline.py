@@ -0,0 +1,203 @@
+"""Run several WorldData passes over the RMB blocks with one load and one save
+per block.
+
+Each standalone script (merge-buildings.py, random-taverns.py, ...) reads and
+rewrites every block. The pipeline loads a block once, hands the in-memory
+document to each registered pass in order and writes it back once, and only
+if a pass changed it. Blocks whose inputs haven't changed since the last run
+are skipped; see bvtools/manifest.py. Run from the WorldData directory:
+
+    python -m bvtools.pipeline                        # default build order
+    python -m bvtools.pipeline --passes chimney,raise
+    python -m bvtools.pipeline --force                # ignore the manifest
+    python -m bvtools.pipeline --packed               # use the .bvwork copy
+    python -m bvtools.pipeline --list
+"""
+import argparse
+import json
+import os
+
+from bvtools import cache, files as file_writer, packed as packed_copy, rng, templates
+from bvtools.buildings import natural_key
+from bvtools.codec import load_json_file
+from bvtools.manifest import Manifest, hash_text
+
+# Passes in build order, keyed by name. Filled in by register_pass().
+PASSES = {}
+
+DEFAULT_PASSES = ["merge", "taverns", "dieps", "interiors", "chimney", "npcs", "raise"]
+
+
+class Pass:
+    def __init__(self, name, func, setup=None, finish=None, signature=None, restore=None, description=""):
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.finish = finish
+        self.signature = signature
+        self.restore = restore
+        self.description = description
+
+
+class Context:
+    """Per-run state shared by the passes (template lists, CSV rows, ...).
+    Setup hooks add attributes to it.
+
+    While a block is processed, inputs holds the files the passes read for it
+    and notes anything a pass needs back when the block is skipped next time.
+    """
+
+    def __init__(self, directory=".", seed=None):
+        self.directory = directory
+        # Master seed for the randomizing passes; see bvtools/rng.py.
+        self.seed = rng.resolve_seed(seed)
+        self.inputs = set()
+        self.notes = {}
+
+    def add_input(self, path):
+        self.inputs.add(path)
+
+    def load_input(self, path):
+        """Load a template or override for the current block and record it as
+        one of the block's inputs."""
+        self.add_input(path)
+        return load_json_file(path)
+
+    def load_template(self, path):
+        """Like load_input(), for tavern/DIEP templates that many blocks
+        share: served from the template cache, each call a private copy."""
+        self.add_input(path)
+        return templates.load(path)
+
+
+def register_pass(name, setup=None, finish=None, signature=None, restore=None):
+    """Register func(ctx, path, data) -> bool as a pipeline pass.
+
+    setup(ctx) runs once before the first block and finish(ctx) once after
+    the last. The pass returns True if it changed data.
+
+    signature(ctx, path) returns a string describing what the pass could pick
+    from for the block (e.g. the template listing); when it changes the block
+    is rebuilt. restore(ctx, path, notes) is called instead of the pass for a
+    block that is skipped, with whatever the pass put in ctx.notes[name].
+    """
+    def decorator(func):
+        description = (func.__doc__ or "").strip().splitlines()[0] if func.__doc__ else ""
+        PASSES[name] = Pass(name, func, setup, finish, signature, restore, description)
+        return func
+    return decorator
+
+
+def find_blocks(directory="."):
+    return sorted(
+        (os.path.join(directory, f) for f in os.listdir(directory)
+         if f.endswith(".RMB.json")),
+        key=natural_key)
+
+
+def block_signature(ctx, passes, path, packed=False):
+    parts = [[p.name, p.signature(ctx, path) if p.signature else ""] for p in passes]
+    if packed:
+        parts.append(["packed", ""])
+    return hash_text(json.dumps(parts))
+
+
+def run(pass_names, files=None, directory=".", force=False, packed=False, seed=None):
+    """Apply the named passes, in order, to every block in files. Blocks the
+    manifest says are up to date are skipped unless force is set.
+
+    With packed, blocks are read from and saved to the packed working copy
+    (see bvtools/packed.py) and the JSON is left alone until it is exported.
+    seed is the master random seed (rng.resolve_seed()).
+    """
+    passes = [PASSES[name] for name in pass_names]
+    ctx = Context(directory, seed)
+    for p in passes:
+        if p.setup:
+            p.setup(ctx)
+
+    if files is None:
+        files = find_blocks(directory)
+
+    manifest = Manifest(directory=directory)
+    if not force:
+        manifest.load()
+
+    written_before = file_writer.stats["written"]
+    skipped = 0
+    for path in files:
+        signature = block_signature(ctx, passes, path, packed)
+        output = packed_copy.working_path(path, directory) if packed else None
+        if manifest.is_fresh(path, signature, output):
+            notes = manifest.notes(path)
+            for p in passes:
+                if p.restore:
+                    p.restore(ctx, path, notes.get(p.name))
+            skipped += 1
+            continue
+
+        print(f"Processing: {path}")
+        data = packed_copy.load(path, directory) if packed else cache.load_json_file(path)
+        if data is None:
+            continue
+
+        ctx.inputs = set()
+        ctx.notes = {}
+        changed = False
+        for p in passes:
+            if p.func(ctx, path, data):
+                changed = True
+
+        if changed:
+            saved_ok = packed_copy.save(path, data, directory=directory) if packed else cache.save_json_file(path, data)
+            if not saved_ok:
+                continue
+        manifest.record(path, signature, ctx.inputs, ctx.notes, output)
+
+    for p in passes:
+        if p.finish:
+            p.finish(ctx)
+
+    try:
+        manifest.save()
+    except OSError as e:
+        print(f"Warning: could not write build manifest '{manifest.path}'. {e}")
+
+    saved = file_writer.stats["written"] - written_before
+    print(f"{len(files) - skipped} blocks processed, {saved} written, {skipped} up to date.")
+    cache.report()
+    templates.report()
+    file_writer.report()
+
+
+def main():
+    from bvtools import passes  # noqa: F401  (registers the passes)
+
+    parser = argparse.ArgumentParser(description="Apply WorldData passes to every RMB block in one load/save.")
+    parser.add_argument("--passes", default=",".join(DEFAULT_PASSES),
+                        help=f"comma-separated pass names in order (default: {','.join(DEFAULT_PASSES)})")
+    parser.add_argument("--force", action="store_true", help="rebuild every block, even those the manifest says are up to date")
+    parser.add_argument("--packed", action="store_true", help="work on the packed copy in .bvwork; export it with python -m bvtools.packed export")
+    parser.add_argument("--list", action="store_true", help="list the available passes and exit")
+    rng.add_seed_argument(parser)
+    parser.add_argument("files", nargs="*", help="blocks to process (default: every *.RMB.json in the current directory)")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, p in PASSES.items():
+            print(f"{name:<10} {p.description}")
+        return
+
+    pass_names = [name.strip() for name in args.passes.split(",") if name.strip()]
+    unknown = [name for name in pass_names if name not in PASSES]
+    if unknown:
+        parser.error(f"unknown pass(es): {', '.join(unknown)}")
+
+    run(pass_names, args.files or None, force=args.force, packed=args.packed, seed=args.seed)
+
+
+if __name__ == "__main__":
+    # Run main() from the importable module so the passes register into the
+    # same PASSES dict it reads, not into this __main__ copy.
+    from bvtools.pipeline import main
+    main()
@@ -0,0 +1,210 @@
+"""Unique values for the Position field of block objects.
+
+DFU tells objects apart by their Position, so objects added to the mod get
+"Position": 0 and are later given an unused value: assign_zero_positions()
+for decoded documents, replace_zero_positions() for a file's text in a single
+pass over it.
+
+PositionRegistry remembers the Positions every JSON file under WorldData
+(blocks, buildings, diep, Archaeologists Patch, ...) already uses, so new
+values are unique across the whole mod and not just the directory being
+fixed. It is kept in .bvcache/positions.json and only rereads files whose
+size or mtime changed since the last run. It also hands out new values:
+lease(count) reserves a block of count consecutive unused Positions, and the
+registry never leases a value twice, so files given their own blocks up
+front can be filled in by parallel workers without any coordination.
+"""
+import bisect
+import json
+import os
+import re
+
+from bvtools import cache, patcher
+from bvtools.patcher import ANY
+
+ZERO_POSITION = re.compile(r'"Position": 0(?![\d.eE])')
+POSITION_VALUE = re.compile(r'"Position":\s*(-?\d+)(?![\d.eE])')
+
+SECTIONS = {"Exterior", "Interior"}
+RECORD_LISTS = {"BlockFlatObjectRecords", "BlockDoorRecords", "BlockPeopleRecords"}
+# Where the objects with a Position field sit in block, building and
+# subrecord files, root first (the block's own Position).
+POSITION_PATTERNS = (
+    (),
+    ("RmbBlock", "MiscFlatObjectRecords", ANY),
+    ("RmbBlock", "SubRecords", ANY, SECTIONS, RECORD_LISTS, ANY),
+    ("RmbSubRecord", SECTIONS, RECORD_LISTS, ANY),
+    ("SubRecords", ANY, SECTIONS, RECORD_LISTS, ANY),
+    ("MiscFlatObjectRecords", ANY),
+)
+
+REGISTRY_VERSION = 2
+# Leases start here, where the old fixed pool of values started.
+FIRST_POSITION = 5000
+# Position is a 32-bit signed integer in DFU.
+MAX_POSITION = 2 ** 31 - 1
+REGISTRY_PATH = os.path.join(cache.CACHE_DIR, "positions.json")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Copies of the game's own files, kept for reference and never loaded by DFU.
+REFERENCE_DIRS = ("vanillarmbs", "vanillaloc")
+
+
+def zero_position_holders(data):
+    """Yield the objects anywhere in data with "Position": 0, in document
+    order."""
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if node.get("Position") == 0 and type(node["Position"]) is int:
+                yield node
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+
+
+def assign_zero_positions(data, unique_positions):
+    """Replace every "Position": 0 in data, in document order, with a value
+    popped from unique_positions. Returns the number of values assigned."""
+    assigned = 0
+    for node in zero_position_holders(data):
+        if not unique_positions:
+            print("Ran out of unique positions")
+            return assigned
+        node["Position"] = unique_positions.pop()
+        assigned += 1
+    return assigned
+
+
+def _holders(node, patterns):
+    if not isinstance(node, (dict, list)):
+        return
+    if () in patterns and isinstance(node, dict) and "Position" in node:
+        yield node
+    items = node.items() if isinstance(node, dict) else enumerate(node)
+    for key, child in items:
+        rest = [p[1:] for p in patterns if p and patcher._matches(p[0], key)]
+        if rest:
+            yield from _holders(child, rest)
+
+
+def position_holders(data):
+    """Yield the objects in data that have a Position field, in document
+    order, visiting only the paths in POSITION_PATTERNS."""
+    return _holders(data, POSITION_PATTERNS)
+
+
+def count_zero_positions(text):
+    return sum(1 for _ in ZERO_POSITION.finditer(text))
+
+
+def replace_zero_positions(text, new_positions):
+    """Give the "Position": 0 fields of text the values of new_positions, in
+    document order, in one pass. Fields beyond the last value stay 0."""
+    values = iter(new_positions)
+
+    def next_value(match):
+        value = next(values, None)
+        return match.group() if value is None else f'"Position": {value}'
+
+    return ZERO_POSITION.sub(next_value, text)
+
+
+def positions_in_text(text):
+    """Every nonzero Position value in text."""
+    return {int(m.group(1)) for m in POSITION_VALUE.finditer(text)} - {0}
+
+
+class PositionRegistry:
+    """The Positions used by the JSON files under root, per file."""
+
+    def __init__(self, root=ROOT, path=REGISTRY_PATH):
+        self.root = os.path.abspath(root)
+        self.path = path
+        self.files = {}
+        self.next = FIRST_POSITION
+        self._used = None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("version") == REGISTRY_VERSION:
+                self.files = saved["files"]
+                self.next = saved["next"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error: Ignoring unreadable position registry '{path}'. {e}")
+
+    def key(self, path):
+        return os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, "/")
+
+    def find_json_files(self):
+        found = []
+        for root, dirs, names in os.walk(self.root):
+            # .bvcache, .bvwork, .git and the vanilla reference copies
+            dirs[:] = [d for d in dirs if not d.startswith(".")
+                       and not (root == self.root and d in REFERENCE_DIRS)]
+            found.extend(os.path.join(root, name) for name in names if name.endswith(".json"))
+        return found
+
+    def record(self, path, text=None):
+        """Note the Positions path uses now. text, if given, is its content."""
+        st = os.stat(path)
+        if text is None:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        self.files[self.key(path)] = [st.st_size, st.st_mtime_ns, sorted(positions_in_text(text))]
+        self._used = None
+
+    def refresh(self):
+        """Reread the files that changed since they were recorded and forget
+        the ones that are gone."""
+        seen = set()
+        for path in self.find_json_files():
+            key = self.key(path)
+            seen.add(key)
+            entry = self.files.get(key)
+            try:
+                st = os.stat(path)
+                if entry is None or entry[0] != st.st_size or entry[1] != st.st_mtime_ns:
+                    self.record(path)
+            except Exception as e:
+                print(f"Error: Failed to read positions from '{path}'. {e}")
+        for key in set(self.files) - seen:
+            del self.files[key]
+        self._used = None
+
+    def used(self):
+        used = set()
+        for _, _, positions in self.files.values():
+            used.update(positions)
+        return used
+
+    def lease(self, count):
+        """Reserve count consecutive Positions no file uses and no earlier
+        lease got, and return them as a range. Raises ValueError once the
+        32-bit range is exhausted."""
+        if self._used is None:
+            self._used = sorted(self.used())
+        used = self._used
+        start = self.next
+        while True:
+            if start + count - 1 > MAX_POSITION:
+                raise ValueError(f"No {count} consecutive unused Positions left")
+            i = bisect.bisect_left(used, start)
+            # Values in use are sparse, so the gap up to the next one is
+            # almost always big enough.
+            if i == len(used) or used[i] >= start + count:
+                break
+            start = used[i] + 1
+        self.next = start + count
+        return range(start, start + count)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Not files.write_text(): the registry isn't one of the mod's files
+        # and shouldn't show up in the "Files: ... written" summary.
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": REGISTRY_VERSION, "next": self.next, "files": self.files}, f)
+        os.replace(tmp, self.path)
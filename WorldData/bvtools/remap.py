@@ -0,0 +1,347 @@
+"""Declarative remapping of block records by ModelIdNum or texture.
+
+The remap scripts (migrate-det.py, Farms/crops.py, diep-bcbvified.py, ...)
+each boil down to a table: records whose ModelIdNum, TextureArchive or
+(TextureArchive, TextureRecord) is in it get changed, moved or removed. Here
+such a table is a rule:
+
+    {"match": "ModelIdNum", "action": "remap", "to": {69438: 69432}}
+    {"match": "ModelIdNum", "action": "remove", "keys": [45078, 45079]}
+    {"match": "ModelIdNum", "action": "reset_rotation", "keys": [41009]}
+    {"match": "Texture", "action": "remap", "to": {(1300, 3): (182, 24)},
+     "lists": ["BlockPeopleRecords"]}
+    {"match": "Texture", "action": "move", "to": {(1300, 3): (182, 24)},
+     "lists": ["BlockFlatObjectRecords"], "into": "BlockPeopleRecords"}
+    {"match": "TextureArchive", "action": "offset", "keys": range(1002, 1071), "by": 9000}
+    {"match": "TextureArchive", "action": "reroll", "keys": [1037],
+     "field": "TextureRecord", "above": 11, "range": [0, 11]}
+
+"lists" names the record lists a rule applies to. It defaults to the 3D
+object lists for ModelIdNum rules and to the flat and people lists for
+texture rules. "sections" ("Exterior", "Interior") limits a rule to
+subrecord sections; the block's Misc lists belong to no section, so a rule
+with "sections" never touches them. "name", if given, labels the rule in
+Remapper.report().
+
+Remapper compiles rules into one dict per list and key, so a record costs a
+few lookups however many rules there are, and it visits only the record
+lists some rule applies to. A record matched by several rules gets them in
+rule order, and a rule sees what earlier ones did: a model remapped to 41009
+is then caught by a reset_rotation rule for 41009. A record moved to
+another list also gets that list's rules, if the list comes later in the
+file. Any number of tables can be applied in one traversal per file.
+
+A rule file is a JSON list of rules, with pairs written as [from, to] lists
+since JSON keys can't be tuples, and can be applied from the WorldData
+directory:
+
+    python -m bvtools.remap rules.json [files or directories] [-j N]
+
+affected_files() asks the catalog (bvtools.catalog) which files hold a
+record some rule matches, so a remap that concerns three blocks opens three
+files.
+"""
+import argparse
+import functools
+import json
+import os
+import sys
+
+from bvtools import catalog, codec, packed, patcher, rng
+from bvtools.parallel import add_jobs_argument, map_files, report_errors
+from bvtools.patcher import ANY
+
+MODEL_LISTS = ("Block3dObjectRecords", "Misc3dObjectRecords")
+FLAT_LISTS = ("BlockFlatObjectRecords", "BlockPeopleRecords", "MiscFlatObjectRecords")
+SECTIONS = {"Exterior", "Interior"}
+
+# The objects holding record lists in block, building and subrecord files,
+# with where the section name is in the path (None for the block itself,
+# which holds the Misc lists).
+CONTAINER_PATTERNS = (
+    ((), None),
+    (("RmbBlock",), None),
+    (("RmbBlock", "SubRecords", ANY, SECTIONS), 3),
+    (("RmbSubRecord", SECTIONS), 1),
+    (("SubRecords", ANY, SECTIONS), 2),
+)
+
+# What rules can match on; the catalog indexes each of them.
+MATCHES = ("ModelIdNum", "TextureArchive", "Texture")
+ROTATION_KEYS = ("XRotation", "YRotation", "ZRotation")
+
+REMOVE = "remove"
+MOVE = "move"
+
+
+def _int(value):
+    return value if type(value) is int else None
+
+
+def record_key(record, match):
+    """The value of record that rules matching on match look up."""
+    if match == "Texture":
+        archive = _int(record.get("TextureArchive"))
+        texture = _int(record.get("TextureRecord"))
+        return None if archive is None or texture is None else (archive, texture)
+    return _int(record.get(match))
+
+
+def _rule_key(key):
+    # Pairs come as lists from JSON, and dict keys as strings.
+    if isinstance(key, list):
+        return tuple(key)
+    if isinstance(key, str) and key.lstrip("-").isdigit():
+        return int(key)
+    return key
+
+
+def _pairs(table):
+    items = table.items() if isinstance(table, dict) else table
+    return [(_rule_key(k), tuple(v) if isinstance(v, list) else v) for k, v in items]
+
+
+def _set_key(record, match, value):
+    if match == "Texture":
+        record["TextureArchive"], record["TextureRecord"] = value
+    elif match == "ModelIdNum":
+        record["ModelIdNum"], record["ModelId"] = value, str(value)
+    else:
+        record[match] = value
+
+
+def _compile(rule):
+    """Return (keys, where, apply) for a rule. apply(record, key, choices)
+    changes the record and returns None, REMOVE or (MOVE, list name)."""
+    match = rule["match"]
+    action = rule["action"]
+    if match not in MATCHES:
+        raise ValueError(f"Unknown remap match '{match}'")
+    if action in ("remap", "move"):
+        mapping = dict(_pairs(rule["to"]))
+        keys = mapping
+    else:
+        mapping = None
+        keys = [_rule_key(k) for k in rule["keys"]]
+
+    if action == "remap":
+        def apply(record, key, choices):
+            _set_key(record, match, mapping[key])
+    elif action == "move":
+        into = rule["into"]
+
+        def apply(record, key, choices):
+            _set_key(record, match, mapping[key])
+            return MOVE, into
+    elif action == "remove":
+        def apply(record, key, choices):
+            return REMOVE
+    elif action == "reset_rotation":
+        def apply(record, key, choices):
+            record.update(dict.fromkeys(ROTATION_KEYS, 0))
+    elif action == "offset":
+        by = rule["by"]
+
+        def apply(record, key, choices):
+            _set_key(record, match, key + by)
+    elif action == "reroll":
+        field = rule["field"]
+        low, high = rule["range"]
+
+        def apply(record, key, choices):
+            record[field] = choices.randint(low, high)
+    else:
+        raise ValueError(f"Unknown remap action '{action}'")
+
+    where = None
+    if "above" in rule:
+        field = rule["field"]
+        above = rule["above"]
+
+        def where(record):
+            return record.get(field, 0) > above
+    return keys, where, apply
+
+
+class Remapper:
+    """A compiled set of rules. counts[i] is how many records rule i has
+    changed so far."""
+
+    def __init__(self, rules):
+        self.rules = [dict(rule) for rule in rules]
+        # list name -> [(match, {key: [(rule index, sections, where, apply)]})]
+        self.tables = {}
+        for index, rule in enumerate(self.rules):
+            match = rule["match"]
+            keys, where, apply = _compile(rule)
+            sections = frozenset(rule["sections"]) if rule.get("sections") else None
+            default = MODEL_LISTS if match == "ModelIdNum" else FLAT_LISTS
+            for list_name in rule.get("lists") or default:
+                table = self.tables.setdefault(list_name, [])
+                lookup = dict(table).get(match)
+                if lookup is None:
+                    lookup = {}
+                    table.append((match, lookup))
+                entry = (index, sections, where, apply)
+                for key in keys:
+                    lookup.setdefault(key, []).append(entry)
+        self.counts = [0] * len(self.rules)
+        self.keys = {match: set() for match in MATCHES}
+        for table in self.tables.values():
+            for match, lookup in table:
+                self.keys[match].update(lookup)
+
+    def _record(self, record, table, section, choices):
+        """Apply the matching rules to record, in rule order. Returns
+        (changed, outcome), outcome being None, REMOVE or (MOVE, list)."""
+        last = -1
+        while True:
+            best = None
+            for match, lookup in table:
+                key = record_key(record, match)
+                if key is None:
+                    continue
+                for entry in lookup.get(key, ()):
+                    index, sections, where, _ = entry
+                    if index <= last or (sections is not None and section not in sections):
+                        continue
+                    if where is not None and not where(record):
+                        continue
+                    if best is None or index < best[0][0]:
+                        best = (entry, key)
+                    break
+            if best is None:
+                return last >= 0, None
+            (index, _, _, apply), key = best
+            last = index
+            self.counts[index] += 1
+            outcome = apply(record, key, choices)
+            if outcome is not None:
+                return True, outcome
+
+    def apply_list(self, container, list_name, section=None, choices=None):
+        """Apply the rules to container[list_name], a record list of a
+        subrecord section (section is "Exterior" or "Interior") or of a
+        block (section None). Returns True if anything changed."""
+        table = self.tables.get(list_name)
+        records = container.get(list_name)
+        if table is None or not isinstance(records, list):
+            return False
+        kept = []
+        changed = False
+        for record in records:
+            if not isinstance(record, dict):
+                kept.append(record)
+                continue
+            record_changed, outcome = self._record(record, table, section, choices)
+            changed |= record_changed
+            if outcome == REMOVE:
+                continue
+            if outcome is not None:
+                # Lands at the end of the target list, which gets its own
+                # rules if it comes later in the file.
+                container.setdefault(outcome[1], []).append(record)
+                continue
+            kept.append(record)
+        if len(kept) != len(records):
+            container[list_name] = kept
+        return changed
+
+    def apply_section(self, container, section=None, choices=None):
+        """Apply the rules to every record list of one container, in the
+        order they appear. Returns True if anything changed."""
+        changed = False
+        for list_name in list(container):
+            if list_name in self.tables:
+                changed |= self.apply_list(container, list_name, section, choices)
+        return changed
+
+    def apply(self, data, choices=None):
+        """Apply the rules to every record list of a block, building or
+        subrecord document, in document order. choices is the random.Random
+        that reroll rules draw from. Returns True if anything changed."""
+        return self._walk(data, CONTAINER_PATTERNS, 0, None, choices)
+
+    def report(self):
+        """Print how many records each rule changed in this process."""
+        for rule, count in zip(self.rules, self.counts):
+            if count:
+                print(f"  {rule.get('name') or rule['match'] + ' ' + rule['action']}: {count} record(s)")
+
+    def _walk(self, node, patterns, depth, section, choices):
+        changed = False
+        holds_lists = isinstance(node, dict) and any(len(p) == depth for p, _ in patterns)
+        items = list(node.items()) if isinstance(node, dict) else enumerate(node)
+        for key, child in items:
+            if holds_lists and key in self.tables:
+                changed |= self.apply_list(node, key, section, choices)
+                continue
+            if not isinstance(child, (dict, list)):
+                continue
+            rest = [(p, s) for p, s in patterns if len(p) > depth and patcher._matches(p[depth], key)]
+            if rest:
+                child_section = key if any(s == depth for _, s in rest) else section
+                changed |= self._walk(child, rest, depth + 1, child_section, choices)
+        return changed
+
+
+def affected_files(remapper, directory=".", recursive=True, jobs=1):
+    """The JSON files in directory holding a record some rule of remapper
+    matches, looked up in the catalog instead of opening every file."""
+    keys = remapper.keys
+    return catalog.files_matching(directory, keys["ModelIdNum"], keys["Texture"], keys["TextureArchive"],
+                                  recursive, jobs)
+
+
+def load_rules(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@functools.lru_cache(maxsize=None)
+def _remapper(rules_path):
+    # Compiled once per process, however many files it handles.
+    return Remapper(load_rules(rules_path))
+
+
+def _process_file(job):
+    path, rules_path, seed, indent = job
+    data = codec.load_json_file(path)
+    if data is None:
+        return False
+    if _remapper(rules_path).apply(data, rng.stream(seed, "remap", os.path.basename(path))):
+        if codec.save_json_file(path, data, indent):
+            print(f"Updated: {path}")
+        return True
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply a JSON file of remap rules to WorldData files.")
+    parser.add_argument("rules", help="JSON list of rules")
+    parser.add_argument("paths", nargs="*", default=["."], help="files or directories (default: .)")
+    parser.add_argument("--indent", type=int, default=4, help="indent of the files written (default: 4)")
+    parser.add_argument("--all", action="store_true",
+                        help="open every file instead of only those the catalog says a rule matches")
+    add_jobs_argument(parser)
+    rng.add_seed_argument(parser)
+    args = parser.parse_args()
+
+    # Fail on a bad rule file before touching anything
+    remapper = Remapper(load_rules(args.rules))
+    paths = packed.find_json(args.paths)
+    if not args.all:
+        affected = set()
+        for path in args.paths:
+            affected.update(affected_files(remapper, path, jobs=args.jobs) if os.path.isdir(path) else [path])
+        paths = [path for path in paths if path in affected]
+    seed = rng.resolve_seed(args.seed)
+    rules_path = os.path.abspath(args.rules)
+    jobs = [(path, rules_path, seed, args.indent) for path in paths]
+    results = map_files(_process_file, jobs, args.jobs)
+    print(f"{sum(1 for r in results if r.result)} of {len(results)} files changed")
+    return 1 if report_errors(results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""Seeded random streams for the scripts that randomize the mod.
+
+Every random choice is drawn from a stream named after what it decides, e.g.
+the tavern of subrecord 3 of TVRNAS00.RMB:
+
+    rng.stream(seed, "taverns", "TVRNAS00.RMB", 3).choice(templates)
+
+A stream is a random.Random seeded from a hash of the run's master seed and
+its name. It doesn't depend on which other streams were used, how many, or
+in what order, so a block gets the same result whether it is processed
+alone, serially with the rest, or in a worker process with --jobs N.
+
+The master seed comes from --seed, else the BVTOOLS_SEED environment
+variable, else DEFAULT_SEED, so a plain rerun reproduces the mod exactly.
+Pass a different seed to roll a different one.
+"""
+import hashlib
+import os
+import random
+
+DEFAULT_SEED = 0
+
+
+def add_seed_argument(parser):
+    parser.add_argument("--seed", type=int, default=None,
+                        help=f"master random seed (default: $BVTOOLS_SEED or {DEFAULT_SEED})")
+
+
+def resolve_seed(seed=None):
+    if seed is not None:
+        return seed
+    env = os.environ.get("BVTOOLS_SEED")
+    return int(env) if env else DEFAULT_SEED
+
+
+def stream(seed, *names):
+    """An independent random.Random for seed and names (strings or ints)."""
+    key = "\0".join(str(part) for part in (seed,) + names)
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:16], "big"))
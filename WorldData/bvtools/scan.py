@@ -0,0 +1,144 @@
+"""Read-only scans that pull a few fields out of WorldData JSON.
+
+Reports like "every TextureArchive/TextureRecord pair in the interiors" only
+need a sliver of each file. values() walks the text along a patcher-style
+path pattern and yields just the matching values, decoded, one at a time.
+Everything off the pattern's path is skipped with patcher.skip(), which
+finds the end of a pretty-printed container without tokenizing it, and no
+object tree is built beyond the value being yielded. Memory stays at the
+text of the file being read, however many files a report walks.
+
+    pattern = ("RmbSubRecord", "Interior", "BlockFlatObjectRecords", ANY,
+               {"TextureArchive", "TextureRecord"})
+    for path, fields in records(text, pattern):
+        ...   # fields == {"TextureArchive": 1200, "TextureRecord": 3}
+"""
+import itertools
+import json
+
+from bvtools import codec, patcher
+from bvtools.patcher import ANY
+
+# Near the end of a pattern (only ANY left before the last element, as in
+# "every record's ModelId") containers up to this many characters are decoded
+# whole by the C decoder and filtered in Python. Larger ones are walked.
+DECODE_SIZE = 65536
+
+_decoder = json.JSONDecoder()
+
+
+def _decode(text, pos):
+    """Decode the value at pos. Returns (value, end)."""
+    try:
+        return _decoder.raw_decode(text, pos)
+    except ValueError:
+        # Raw backslashes or trailing commas: let codec.loads() cope.
+        end = patcher.skip(text, pos)
+        return codec.loads(text[pos:end]), end
+
+
+def _ws(text, pos):
+    return patcher._WS.match(text, pos).end()
+
+
+def _select(value, pattern, path):
+    """Yield (path, value) for the parts of a decoded value matching pattern."""
+    if not pattern:
+        yield path, value
+        return
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        return
+    element = pattern[0]
+    for key, child in items:
+        if patcher._matches(element, key):
+            yield from _select(child, pattern[1:], path + (key,))
+
+
+def _walk(text, pos, pattern, path, whole_from):
+    """Yield (path, value) under the value at pos, then return its end."""
+    pos = _ws(text, pos)
+    depth = len(path)
+    if depth == len(pattern):
+        value, end = _decode(text, pos)
+        yield path, value
+        return end
+    c = text[pos]
+    if depth >= whole_from and c in '{[':
+        end = patcher.skip(text, pos)
+        if end - pos <= DECODE_SIZE:
+            yield from _select(_decode(text, pos)[0], pattern[depth:], path)
+            return end
+    element = pattern[depth]
+    if c == '{':
+        pos += 1
+        while True:
+            pos = _ws(text, pos)
+            c = text[pos]
+            if c == '}':
+                return pos + 1
+            if c == ',':
+                pos += 1
+                continue
+            m = patcher._STRING.match(text, pos)
+            if m is None:
+                raise ValueError(f"Expected a key at offset {pos}")
+            key = m.group()[1:-1]
+            pos = _ws(text, m.end())
+            if text[pos] != ':':
+                raise ValueError(f"Expected ':' at offset {pos}")
+            pos = _ws(text, pos + 1)
+            if patcher._matches(element, key):
+                pos = yield from _walk(text, pos, pattern, path + (key,), whole_from)
+            else:
+                pos = patcher.skip(text, pos)
+    if c == '[':
+        pos += 1
+        index = 0
+        while True:
+            pos = _ws(text, pos)
+            c = text[pos]
+            if c == ']':
+                return pos + 1
+            if c == ',':
+                pos += 1
+                continue
+            if patcher._matches(element, index):
+                pos = yield from _walk(text, pos, pattern, path + (index,), whole_from)
+            else:
+                pos = patcher.skip(text, pos)
+            index += 1
+    # A scalar where the pattern wanted a container: nothing matches here.
+    return patcher.skip(text, pos)
+
+
+def values(text, pattern):
+    """Yield (path, value) for every value in text whose path matches
+    pattern, in document order. The pattern is written as for patcher.find(),
+    but may also end at containers, which are yielded decoded."""
+    pattern = tuple(pattern)
+    whole_from = len(pattern) - 1
+    while whole_from > 0 and pattern[whole_from - 1] == ANY:
+        whole_from -= 1
+    yield from _walk(text, 0, pattern, (), whole_from)
+
+
+def records(text, pattern):
+    """Like values(), grouped by the object holding them: yields
+    (parent path, {key: value}) for each object with a matching key."""
+    for parent, group in itertools.groupby(values(text, pattern), key=lambda item: item[0][:-1]):
+        yield parent, {path[-1]: value for path, value in group}
+
+
+def read_text(path):
+    """The text of a JSON file, or None (with the error printed) if it can't
+    be read."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except Exception as e:
+        print(f"Error: Unexpected error while reading file '{path}'. {e}")
+        return None
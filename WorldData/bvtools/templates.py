@@ -0,0 +1,62 @@
+"""In-memory cache of decoded tavern and DIEP templates.
+
+random-taverns.py and random-dieps.py pick from a few hundred templates for
+thousands of buildings, so the same file would otherwise be read and decoded
+dozens of times per run. load() decodes each template once and keeps it
+pickled; every call unpickles a fresh copy, so a block can modify the
+interior it was given without touching the cached template or other blocks.
+
+The cache holds at most MAX_BYTES of pickled templates and drops the least
+recently used ones beyond that. Set BVTOOLS_TEMPLATE_CACHE_MB to change it.
+"""
+import os
+import pickle
+from collections import OrderedDict
+
+from bvtools.codec import load_json_file
+
+MAX_BYTES = int(float(os.environ.get("BVTOOLS_TEMPLATE_CACHE_MB", 64)) * 1024 * 1024)
+
+# path -> pickled document, least recently used first
+_entries = OrderedDict()
+
+stats = {"hits": 0, "misses": 0, "bytes": 0, "evictions": 0}
+
+
+def load(path):
+    """Return a private copy of the template at path, or None if it can't be
+    read (the error is printed, as with codec.load_json_file())."""
+    key = os.path.abspath(path)
+    blob = _entries.get(key)
+    if blob is not None:
+        _entries.move_to_end(key)
+        stats["hits"] += 1
+        return pickle.loads(blob)
+
+    stats["misses"] += 1
+    data = load_json_file(path)
+    if data is None:
+        return None
+    blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(blob) <= MAX_BYTES:
+        _entries[key] = blob
+        stats["bytes"] += len(blob)
+        while stats["bytes"] > MAX_BYTES:
+            _, evicted = _entries.popitem(last=False)
+            stats["bytes"] -= len(evicted)
+            stats["evictions"] += 1
+    # Hand out a copy here too, so the caller never shares objects with the
+    # next caller's copy.
+    return pickle.loads(blob)
+
+
+def clear():
+    _entries.clear()
+    stats["bytes"] = 0
+
+
+def report():
+    if stats["hits"] or stats["misses"]:
+        print(f"Template cache: {stats['hits']} hits, {stats['misses']} misses, "
+              f"{len(_entries)} templates / {stats['bytes'] / (1024 * 1024):.1f} MB held, "
+              f"{stats['evictions']} evictions")
@@ -1,6 +1,13 @@
 #!/usr/bin/env python3
 import os
-import json
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from bvtools.scan import ANY, records
+
+# RmbSubRecord → Interior → BlockFlatObjectRecords → archive/record pairs
+FLAT_TEXTURES = ("RmbSubRecord", "Interior", "BlockFlatObjectRecords", ANY,
+                 {"TextureArchive", "TextureRecord"})
 
 def main():
     combos = set()
@@ -10,33 +17,19 @@ def main():
         for fn in files:
             if fn.lower().endswith('.json'):
                 path = os.path.join(root, fn)
+                # Only the flat records are read; the rest of the file is skipped
+                found = set()
                 try:
                     with open(path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                except (json.JSONDecodeError, UnicodeDecodeError):
-                    continue
-
-                # Only process if the root is an object
-                if not isinstance(data, dict):
-                    continue
-
-                # Navigate into RmbSubRecord → Interior → BlockFlatObjectRecords
-                rmb_sub = data.get('RmbSubRecord')
-                if not isinstance(rmb_sub, dict):
-                    continue
-
-                interior = rmb_sub.get('Interior', {})
-                records = interior.get('BlockFlatObjectRecords', [])
-                if not isinstance(records, list):
+                        for _, entry in records(f.read(), FLAT_TEXTURES):
+                            ta = entry.get('TextureArchive')
+                            tr = entry.get('TextureRecord')
+                            if isinstance(ta, int) and isinstance(tr, int):
+                                if (1200 <= ta <= 1400) or (10011 <= ta <= 10020):
+                                    found.add((ta, tr))
+                except (ValueError, IndexError, UnicodeDecodeError):
                     continue
-
-                # Collect matching archive/record combos
-                for entry in records:
-                    ta = entry.get('TextureArchive')
-                    tr = entry.get('TextureRecord')
-                    if isinstance(ta, int) and isinstance(tr, int):
-                        if (1200 <= ta <= 1400) or (10011 <= ta <= 10020):
-                            combos.add((ta, tr))
+                combos |= found
 
     # Report results
     for ta, tr in sorted(combos):
@@ -45,4 +38,3 @@ def main():
 
 if __name__ == '__main__':
     main()
-
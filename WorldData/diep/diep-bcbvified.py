@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
+import argparse
 import os
-import json
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from bvtools.codec import load_json_file, save_json_file
+from bvtools.remap import Remapper, affected_files
 
 # IDs to remove entirely from Block3dObjectRecords
 REMOVE_IDS = {
@@ -44,24 +49,17 @@ PEOPLE_TEXTURE_MAPPING = {
     (183,  11): (184,  5),
 }
 
-def process_people_records(records):
-    changed = False
-    for entry in records:
-        ta = entry.get("TextureArchive")
-        tr = entry.get("TextureRecord")
-        try:
-            key = (int(ta), int(tr))
-        except (TypeError, ValueError):
-            continue
-
-        if key in PEOPLE_TEXTURE_MAPPING:
-            new_ta, new_tr = PEOPLE_TEXTURE_MAPPING[key]
-            entry["TextureArchive"] = new_ta
-            entry["TextureRecord"]  = new_tr
-            # debug: comment out if noisy
-            print(f"  swapped person texture {key} → {(new_ta,new_tr)}")
-            changed = True
-    return changed
+DIEP_RULES = [
+    {"name": "3D removed", "match": "ModelIdNum", "action": "remove", "keys": REMOVE_IDS,
+     "sections": ["Interior"]},
+    {"name": "3D remapped", "match": "ModelIdNum", "action": "remap", "to": MODEL_MAPPING,
+     "sections": ["Interior"]},
+    {"name": "3D rotations reset", "match": "ModelIdNum", "action": "reset_rotation", "keys": [41009],
+     "sections": ["Interior"]},
+    {"name": "person textures swapped", "match": "Texture", "action": "remap", "to": PEOPLE_TEXTURE_MAPPING,
+     "lists": ["BlockPeopleRecords"], "sections": ["Interior"]},
+]
+remapper = Remapper(DIEP_RULES)
 
 def process_rmb_json(data):
     changed = False
@@ -70,91 +68,19 @@ def process_rmb_json(data):
         return False
 
     for sub in rmb.get("SubRecords", []):
-        interior = sub.get("Interior", {})
-
-        # 1) 3D objects (unchanged)
-        recs3d = interior.get("Block3dObjectRecords", [])
-        new3d = []
-        for e in recs3d:
-            mid = e.get("ModelIdNum")
-            try:
-                mid_i = int(mid)
-            except (TypeError, ValueError):
-                new3d.append(e)
-                continue
-
-            if mid_i in REMOVE_IDS:
-                changed = True
-                continue
-            if mid_i in MODEL_MAPPING:
-                e["ModelIdNum"] = MODEL_MAPPING[mid_i]
-                e["ModelId"]    = str(MODEL_MAPPING[mid_i])
-                changed = True
-
-            if e.get("ModelIdNum") == 41009:
-                e["XRotation"] = 0
-                e["YRotation"] = 0
-                e["ZRotation"] = 0
-                changed = True
-
-            new3d.append(e)
-        if len(new3d) != len(recs3d):
-            interior["Block3dObjectRecords"] = new3d
-
-        # 2) People textures
-        if process_people_records(interior.get("BlockPeopleRecords", [])):
+        if remapper.apply_section(sub.get("Interior", {}), "Interior"):
             changed = True
-
     return changed
 
 def process_generic_json(data):
-    changed = False
     subrec = data.get("RmbSubRecord")
     if not isinstance(subrec, dict):
         return False
-
-    interior = subrec.get("Interior", {})
-
-    # 1) 3D objects
-    recs3d = interior.get("Block3dObjectRecords", [])
-    new3d = []
-    for e in recs3d:
-        mid = e.get("ModelIdNum")
-        try:
-            mid_i = int(mid)
-        except (TypeError, ValueError):
-            new3d.append(e)
-            continue
-
-        if mid_i in REMOVE_IDS:
-            changed = True
-            continue
-        if mid_i in MODEL_MAPPING:
-            e["ModelIdNum"] = MODEL_MAPPING[mid_i]
-            e["ModelId"]    = str(MODEL_MAPPING[mid_i])
-            changed = True
-
-        if e.get("ModelIdNum") == 41009:
-            e["XRotation"] = 0
-            e["YRotation"] = 0
-            e["ZRotation"] = 0
-            changed = True
-
-        new3d.append(e)
-    if len(new3d) != len(recs3d):
-        interior["Block3dObjectRecords"] = new3d
-
-    # 2) People textures
-    if process_people_records(interior.get("BlockPeopleRecords", [])):
-        changed = True
-
-    return changed
+    return remapper.apply_section(subrec.get("Interior", {}), "Interior")
 
 def process_file(path):
-    try:
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except (json.JSONDecodeError, UnicodeDecodeError):
+    data = load_json_file(path)
+    if data is None:
         return
 
     print(f"Scanning {path}…")
@@ -164,13 +90,25 @@ def process_file(path):
         dirty = process_generic_json(data)
 
     if dirty:
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        save_json_file(path, data, indent=2)
         print(f"→ Updated {path}")
 
 if __name__ == "__main__":
-    for root, _, files in os.walk('.'):
-        for fn in files:
-            if fn.lower().endswith('.json'):
-                process_file(os.path.join(root, fn))
+    parser = argparse.ArgumentParser(description="Remap and remove interior models and NPC textures.")
+    parser.add_argument("--all", action="store_true",
+                        help="open every JSON file, not just those the catalog says hold a mapped record")
+    args = parser.parse_args()
+
+    if args.all:
+        paths = []
+        for root, _, files in os.walk('.'):
+            for fn in files:
+                if fn.lower().endswith('.json'):
+                    paths.append(os.path.join(root, fn))
+    else:
+        paths = affected_files(remapper, '.')
+    for path in paths:
+        process_file(path)
+    print("Records changed:")
+    remapper.report()
 
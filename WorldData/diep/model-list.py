@@ -1,21 +1,12 @@
-import json
 import os
+import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from bvtools.scan import ANY, read_text, values
 
-def load_json_file(file_path):
-    """
-    Loads a JSON file.
-    :param file_path: Path to the JSON file.
-    :return: Parsed JSON data or None if the file couldn't be parsed.
-    """
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return json.load(file)
-    except json.JSONDecodeError as e:
-        print(f"Error: Failed to decode JSON file '{file_path}'. {e}")
-    except Exception as e:
-        print(f"Error: Unexpected error while reading file '{file_path}'. {e}")
-    return None
+# Only these values are read from each file; everything else is skipped
+# without being decoded.
+EXTERIOR_MODEL_IDS = ("RmbSubRecord", "Exterior", "Block3dObjectRecords", ANY, "ModelId")
 
 
 def extract_model_ids(file_path):
@@ -24,23 +15,18 @@ def extract_model_ids(file_path):
     :param file_path: Path to the building JSON file.
     :return: List of ModelId values or an empty list if not found.
     """
-    data = load_json_file(file_path)
-    if not data:
+    text = read_text(file_path)
+    if not text:
         return []
 
     try:
-        block3d_object_records = (
-            data.get("RmbSubRecord", {})
-                .get("Exterior", {})
-                .get("Block3dObjectRecords", [])
-        )
         return [
-            int(record.get("ModelId"))
-            for record in block3d_object_records
-            if "ModelId" in record and str(record.get("ModelId")).isdigit()
+            int(model_id)
+            for _, model_id in values(text, EXTERIOR_MODEL_IDS)
+            if str(model_id).isdigit()
         ]
-    except AttributeError:
-        print(f"Error: Invalid structure in file '{file_path}'.")
+    except (ValueError, IndexError) as e:
+        print(f"Error: Failed to decode JSON file '{file_path}'. {e}")
         return []
 
 
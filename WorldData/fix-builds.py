@@ -1,8 +1,12 @@
-import json
+import argparse
+import functools
 import os
 import glob
-import re
-import random
+
+from bvtools import rng
+from bvtools.locations import VanillaBuildings
+from bvtools.scan import read_text, values
+from bvtools.codec import load_json_file, save_json_file
 
 # Map BuildingType names to enum values
 BUILDING_TYPE_ENUM = {
@@ -45,18 +49,6 @@ BUILDING_TYPE_ENUM = {
 ENUM_TO_BUILDING_TYPE = {v: k for k, v in BUILDING_TYPE_ENUM.items()}
 
 
-def load_json_file(filepath):
-    """Safely load a JSON file with escape sequence handling."""
-    with open(filepath, 'r') as f:
-        content = f.read()
-        content = re.sub(r'\\(?!["\\/bfnrtu])', r'\\\\', content)  # Fix invalid escapes
-        try:
-            return json.loads(content)
-        except json.JSONDecodeError as e:
-            print(f"Error decoding JSON in file {filepath}: {e}")
-            return None
-
-
 def normalize_building_type(building_type):
     """Convert BuildingType to its string equivalent."""
     if isinstance(building_type, int):
@@ -70,50 +62,59 @@ def count_interiors(rmb_data):
     return sum(1 for record in sub_records if 'Interior' in record)
 
 
-def get_vanilla_building_data(location_name):
-    """Extract NameSeed, Quality, and Sector data from the vanilla location JSON."""
-    vanilla_file = os.path.join('vanillaloc', location_name)
+@functools.lru_cache(maxsize=None)
+def block_summary(rmb_file):
+    """(interior count, BuildingDataList entries of the interiors) of a block,
+    or None if it can't be loaded. Read once per run however many locations
+    use the block; callers copy the entries before changing them."""
+    rmb_data = load_json_file(rmb_file)
+    if rmb_data is None:
+        return None
+    building_data_list = rmb_data.get('RmbBlock', {}).get('FldHeader', {}).get('BuildingDataList', [])
+    num_interiors = count_interiors(rmb_data)
+    return num_interiors, tuple(building_data_list[:num_interiors])
+
+
+def index_vanilla_locations(directory='vanillaloc'):
+    """Map the LocationId of every vanilla location file to its path. Only
+    the header is read; the building lists are loaded when a location needs
+    them."""
+    index = {}
+    if not os.path.isdir(directory):
+        return index
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.json'):
+            continue
+        path = os.path.join(directory, filename)
+        text = read_text(path)
+        if text is None:
+            continue
+        try:
+            for _, location_id in values(text, ('Exterior', 'RecordElement', 'Header', 'LocationId')):
+                index.setdefault(location_id, path)
+        except (ValueError, IndexError) as e:
+            print(f"Error: Failed to decode JSON file '{path}'. {e}")
+    return index
+
+
+def get_vanilla_buildings(vanilla_file):
+    """The Buildings list of the vanilla location JSON ([] if unavailable)."""
     if not os.path.exists(vanilla_file):
         print(f"  Vanilla file {vanilla_file} does not exist.")
-        return {}, {}, {}
+        return []
 
     vanilla_data = load_json_file(vanilla_file)
     if vanilla_data is None:
-        return {}, {}, {}
-
-    # Extract building data from vanilla file
-    vanilla_buildings = vanilla_data.get('Exterior', {}).get('Buildings', [])
-    name_seed_list = {}
-    quality_list = {}
-    sector_list = {}
-
-    for building in vanilla_buildings:
-        building_type = normalize_building_type(building.get('BuildingType'))
-
-        name_seed = building.get('NameSeed')
-        quality = building.get('Quality')
-        sector = building.get('Sector')
-
-        # Initialize lists for this building type
-        if building_type not in name_seed_list:
-            name_seed_list[building_type] = []
-            quality_list[building_type] = []
-            sector_list[building_type] = []
-
-        # Append data to respective lists
-        if name_seed is not None:
-            name_seed_list[building_type].append(name_seed)
-        if quality is not None:
-            quality_list[building_type].append(quality)
-        if sector is not None:
-            sector_list[building_type].append(sector)
-
-    return name_seed_list, quality_list, sector_list
-
-def update_buildings():
-    """Update buildings in all location JSON files with vanilla data."""
+        return []
+    return vanilla_data.get('Exterior', {}).get('Buildings', [])
+
+def update_buildings(seed=None):
+    """Update buildings in all location JSON files with vanilla data.
+    NameSeeds without vanilla data are drawn from seed's random streams."""
+    seed = rng.resolve_seed(seed)
     # Get all location JSON files
     location_files = glob.glob('location*.json')
+    vanilla_locations = index_vanilla_locations()
 
     for location_file in location_files:
         print(f"Processing {location_file}")
@@ -135,96 +136,51 @@ def update_buildings():
             print(f"  No BlockNames found in {location_file}.")
             continue
 
-        # Load the vanilla location data
+        # Load the vanilla location data, found by LocationId (or, failing
+        # that, by file name)
         location_name = os.path.basename(location_file)
-        name_seed_list, quality_list, sector_list = get_vanilla_building_data(location_name)
-
-        # Create a dictionary for matching BuildingType and FactionId
-        vanilla_data_by_type_faction = {}
-        for building_type, name_seeds in name_seed_list.items():
-            for i, name_seed in enumerate(name_seeds):
-                # Normalize FactionId: Treat 26 and 92 as the same
-                faction_id = 0
-                if sector_list.get(building_type) and i < len(sector_list[building_type]):
-                    faction_id = sector_list[building_type][i]
-                    if faction_id == 92:
-                        faction_id = 26
-
-                vanilla_data_by_type_faction[(building_type, faction_id)] = {
-                    "NameSeed": name_seed,
-                    "Quality": quality_list[building_type][i] if quality_list.get(building_type) and i < len(quality_list[building_type]) else None,
-                    "Sector": sector_list[building_type][i] if sector_list.get(building_type) and i < len(sector_list[building_type]) else None,
-                }
-
-        # Determine the global maximum Sector value
-        global_max_sector = max(
-            (max(sectors) for sectors in sector_list.values() if sectors), 
-            default=0
-        )
+        vanilla_file = vanilla_locations.get(location_id) or os.path.join('vanillaloc', location_name)
+        vanilla = VanillaBuildings(get_vanilla_buildings(vanilla_file), normalize_building_type)
 
         new_buildings = []
-        used_sectors = set()  # Track used sectors to ensure uniqueness
 
         # Process each block in BlockNames
-        for block_name in block_names:
+        for block_slot, block_name in enumerate(block_names):
             rmb_file = block_name + '.json'
             print(f"  Processing block: {block_name}")
 
-            # Load the RMB data
-            rmb_data = load_json_file(rmb_file)
-            if rmb_data is None:
+            # Building data of the block's interiors, copied since they are
+            # updated for this location
+            summary = block_summary(rmb_file)
+            if summary is None:
                 print(f"    Missing or invalid RMB file: {rmb_file}")
                 continue
-
-            # Extract building data
-            building_data_list = rmb_data.get('RmbBlock', {}).get('FldHeader', {}).get('BuildingDataList', [])
-            num_interiors = count_interiors(rmb_data)
-            buildings_to_add = building_data_list[:num_interiors]
+            buildings_to_add = [dict(building) for building in summary[1]]
+            name_seeds = rng.stream(seed, "nameseeds", location_name, block_slot, block_name)
 
             # Update building data
             for building in buildings_to_add:
                 building_type = normalize_building_type(building.get('BuildingType'))
                 faction_id = building.get('FactionId', 0)
 
-                # Normalize FactionId for matching
-                normalized_faction_id = 26 if faction_id in {26, 92} else faction_id
-
-                # First try to match BuildingType and normalized FactionId
-                key = (building_type, normalized_faction_id)
-                vanilla_data = vanilla_data_by_type_faction.get(key)
-
-                # If no exact match, fallback to match BuildingType only
-                if not vanilla_data and name_seed_list.get(building_type):
-                    vanilla_data = {
-                        "NameSeed": name_seed_list[building_type].pop(0) if name_seed_list[building_type] else None,
-                        "Quality": quality_list[building_type].pop(0) if quality_list.get(building_type) else None,
-                        "Sector": sector_list[building_type].pop(0) if sector_list.get(building_type) else None,
-                    }
+                # Take an unused vanilla building of the same BuildingType and
+                # (normalized) FactionId, else of the same BuildingType
+                vanilla_data = vanilla.take(building_type, faction_id)
 
                 # Assign NameSeed
-                if vanilla_data and vanilla_data["NameSeed"] is not None:
+                if vanilla_data and vanilla_data.get("NameSeed") is not None:
                     building["NameSeed"] = vanilla_data["NameSeed"]
                 else:
-                    building["NameSeed"] = random.randint(0, 30000)
+                    building["NameSeed"] = name_seeds.randint(0, 30000)
 
                 # Assign Quality
-                if vanilla_data and vanilla_data["Quality"] is not None:
+                if vanilla_data and vanilla_data.get("Quality") is not None:
                     building["Quality"] = vanilla_data["Quality"]
                 else:
                     building["Quality"] = building.get("Quality")  # Fallback to RMB quality
 
-                # Assign Sector
-                if vanilla_data and vanilla_data["Sector"] is not None:
-                    sector = vanilla_data["Sector"]
-                else:
-                    # Increment from the global maximum Sector
-                    while global_max_sector in used_sectors:
-                        global_max_sector += 3
-                    sector = global_max_sector
-                    global_max_sector = sector  # Update the global max
-
-                building["Sector"] = sector
-                used_sectors.add(sector)  # Track the used sector
+                # Assign Sector, unique within the location
+                building["Sector"] = vanilla.sectors.claim(vanilla_data.get("Sector") if vanilla_data else None)
 
                 # Assign LocationId
                 building["LocationId"] = location_id
@@ -241,12 +197,14 @@ def update_buildings():
         location_data["Exterior"]["BuildingCount"] = len(new_buildings)
 
         # Save the updated location JSON
-        with open(location_file, "w") as f:
-            json.dump(location_data, f, indent=4)
+        save_json_file(location_file, location_data)
 
         print(f"  Updated {location_file} with {len(new_buildings)} buildings.")
 
 if __name__ == '__main__':
-    update_buildings()
+    parser = argparse.ArgumentParser(description="Rebuild the location building lists from the vanilla data.")
+    rng.add_seed_argument(parser)
+    args = parser.parse_args()
+    update_buildings(args.seed)
 
 
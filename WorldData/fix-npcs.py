@@ -1,34 +1,56 @@
+import argparse
 import os
-import random
 
-def update_position_in_file(file_path, unique_positions, used_positions):
+from bvtools import rng
+from bvtools.files import write_text
+from bvtools.parallel import add_jobs_argument, map_files, report_errors
+from bvtools.positions import PositionRegistry, count_zero_positions, replace_zero_positions
+
+def count_positions(file_path):
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return count_zero_positions(file.read())
+
+def update_position_in_file(job):
+    file_path, new_positions = job
     with open(file_path, 'r', encoding='utf-8') as file:
         content = file.read()
 
-    # Simple find-and-replace for '"Position": 0'
-    occurrences = content.count('"Position": 0')
-    for _ in range(occurrences):
-        if unique_positions:
-            new_position = unique_positions.pop()
-            used_positions.add(new_position)
-            content = content.replace('"Position": 0', f'"Position": {new_position}', 1)
-        else:
-            print(f"Ran out of unique positions while processing {file_path}")
-            break
-
-    with open(file_path, 'w', encoding='utf-8') as file:
-        file.write(content)
-
-def process_all_json_files(directory):
-    unique_positions = list(range(5000, 10001))  # Example range
-    random.shuffle(unique_positions)  # Shuffle to ensure uniqueness across files
-    used_positions = set()  # Track used positions to avoid duplicates
-
-    for filename in os.listdir(directory):
-        if filename.endswith(".json"):
-            file_path = os.path.join(directory, filename)
-            update_position_in_file(file_path, unique_positions, used_positions)
-
-# Process all JSON files in the current directory
-process_all_json_files('.')
+    content = replace_zero_positions(content, new_positions)
+    write_text(file_path, content)
+
+def process_all_json_files(directory, jobs=1, seed=None):
+    seed = rng.resolve_seed(seed)
+    registry = PositionRegistry()
+    registry.refresh()
+
+    file_paths = [os.path.join(directory, filename)
+                  for filename in sorted(os.listdir(directory)) if filename.endswith(".json")]
+
+    # Hand every file its own block of unused positions up front, in file
+    # order, so every worker knows which values it owns and the result
+    # doesn't depend on the number of jobs.
+    counts = map_files(count_positions, file_paths, jobs)
+    update_jobs = []
+    for file_path, count in zip(file_paths, counts):
+        occurrences = count.result or 0
+        if not occurrences:
+            continue
+        new_positions = list(registry.lease(occurrences))
+        rng.stream(seed, "positions", os.path.basename(file_path)).shuffle(new_positions)
+        update_jobs.append((file_path, new_positions))
+    # Leased values stay taken even if a worker fails
+    registry.save()
+
+    results = map_files(update_position_in_file, update_jobs, jobs)
+    report_errors(counts + results)
+    registry.refresh()
+    registry.save()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Give every "Position": 0 a unique value.')
+    add_jobs_argument(parser)
+    rng.add_seed_argument(parser)
+    args = parser.parse_args()
 
+    # Process all JSON files in the current directory
+    process_all_json_files('.', args.jobs, args.seed)